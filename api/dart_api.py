@@ -5,6 +5,8 @@ import zipfile
 import xml.etree.ElementTree as ET
 from io import BytesIO
 
+from core.metrics import api_seconds, timed
+
 from core.logger import get_logger
 logger = get_logger(__name__)
 
@@ -15,6 +17,7 @@ class DartAPI:
     def __init__(self):
         pass
 
+    @timed(api_seconds, client='dart')
     def get_corp_code(self):
         url = 'https://opendart.fss.or.kr/api/corpCode.xml'
         params = {
@@ -59,6 +62,7 @@ class DartAPI:
             json.dump(data_dict, f, ensure_ascii=False, indent=4)
         logger.info("Fetched and saved corp codes from DART API.")
 
+    @timed(api_seconds, client='dart')
     def get_div_info(self, corp_code: str, year: int):
         url = 'https://opendart.fss.or.kr/api/alotMatter.json'
         params = {
@@ -75,6 +79,7 @@ class DartAPI:
 
         return response.json()
 
+    @timed(api_seconds, client='dart')
     def get_fin_info(self, corp_code: str, year: int):
         url = 'https://opendart.fss.or.kr/api/fnlttSinglAcnt.json'
         params = {
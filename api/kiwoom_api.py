@@ -4,6 +4,8 @@ import json
 
 import time
 
+from core.metrics import api_seconds, timed
+from core.schemas import StockDay
 from core.logger import get_logger
 logger = get_logger(__name__)
 
@@ -36,7 +38,12 @@ class KiwoomAPI:
         self._last_api_call = time.time()
         return response
 
+    @timed(api_seconds, client='kiwoom')
     def get_access_token(self):
+        return self._fetch_access_token()
+
+    def _fetch_access_token(self):
+        # 다른 API 메서드 안에서 토큰을 받을 때는 이 함수 (바깥 호출 시간에 포함, 따로 기록하지 않음)
         url = f"{self.api_url}/oauth2/token"
         response = self._post(
             url,
@@ -60,6 +67,7 @@ class KiwoomAPI:
 
         return response.json()
 
+    @timed(api_seconds, client='kiwoom')
     def revoke_access_token(self):
         if not self.access_token:
             logger.log('No token')
@@ -83,9 +91,10 @@ class KiwoomAPI:
 
         return response.json()  # test
 
+    @timed(api_seconds, client='kiwoom')
     def get_stock_info(self, stock_code: str):
         if not self.access_token or self.token_expiry is None:
-            self.get_access_token()
+            self._fetch_access_token()
 
         url = f"{self.api_url}/api/dostk/stkinfo"
         headers = {
@@ -104,9 +113,35 @@ class KiwoomAPI:
         
         return response.json()
 
+    @timed(api_seconds, client='kiwoom')
+    def get_watchlist_info(self, stock_codes: list[str]):
+        '''
+        ka10095 관심종목정보요청 - 여러 종목을 '|'로 묶어 한번에 조회
+        '''
+        if not self.access_token or self.token_expiry is None:
+            self._fetch_access_token()
+
+        url = f"{self.api_url}/api/dostk/stkinfo"
+        headers = {
+            **self.headers,
+            'authorization': f"Bearer {self.access_token}",
+            'api-id': 'ka10095'
+        }
+        response = self._post(
+            url,
+            headers=headers,
+            json={
+                'stk_cd': '|'.join(stock_codes)
+            }
+        )
+        response.raise_for_status()
+
+        return response.json()
+
+    @timed(api_seconds, client='kiwoom')
     def get_account_info(self):
         if not self.access_token or self.token_expiry is None:
-            self.get_access_token()
+            self._fetch_access_token()
 
         url = f"{self.api_url}/api/dostk/acnt"
         headers = {
@@ -124,9 +159,10 @@ class KiwoomAPI:
         response.raise_for_status()
         return response.json()
 
+    @timed(api_seconds, client='kiwoom')
     def get_account_stock_info(self):
         if not self.access_token or self.token_expiry is None:
-            self.get_access_token()
+            self._fetch_access_token()
 
         url = f"{self.api_url}/api/dostk/acnt"
         headers = {
@@ -145,9 +181,10 @@ class KiwoomAPI:
         response.raise_for_status()
         return response.json()
 
+    @timed(api_seconds, client='kiwoom')
     def order(self, stock_code, amount):
         if not self.access_token or self.token_expiry is None:
-            self.get_access_token()
+            self._fetch_access_token()
 
         url = f'{self.api_url}/api/dostk/ordr'
         headers = {
@@ -173,9 +210,10 @@ class KiwoomAPI:
         response.raise_for_status()
         return response.json()
 
+    @timed(api_seconds, client='kiwoom')
     def sell(self, stock_code, amount):
         if not self.access_token or self.token_expiry is None:
-            self.get_access_token()
+            self._fetch_access_token()
 
         url = f'{self.api_url}/api/dostk/ordr'
         headers = {
@@ -201,9 +239,10 @@ class KiwoomAPI:
         response.raise_for_status()
         return response.json()
 
+    @timed(api_seconds, client='kiwoom')
     def ongoing_orders(self):
         if not self.access_token or self.token_expiry is None:
-            self.get_access_token()
+            self._fetch_access_token()
 
         url = f'{self.api_url}/api/dostk/acnt'
         headers = {
@@ -383,6 +422,36 @@ def parse_account_info(data):
     return result
 
 
+def _to_price(n: str) -> int:
+    # 키움 시세 값은 '+74800', '-74800' 처럼 등락 부호가 붙어서 옴
+    try:
+        return abs(int(str(n).replace(',', '')))
+    except ValueError:
+        return 0
+
+def parse_watchlist_stock_day(data, date: str) -> list[StockDay]:
+    '''
+    ka10095 응답 -> StockDay 리스트
+    mac(시가총액)은 억원 단위
+    '''
+    stock_days = []
+    for item in data.get('atn_stk_infr', []):
+        close_price = _to_price(item.get('cur_prc', '0'))
+        if close_price == 0:
+            logger.warning(f"키움 관심종목 현재가 없음: {item.get('stk_cd')}")
+            continue
+        mac = _to_price(item.get('mac', '0'))
+        stock_count = _to_price(item.get('stkcnt', '0'))
+        stock_days.append(StockDay(
+            stock_code=item['stk_cd'],
+            date=date,
+            close_price=close_price,
+            trade_qty=_to_price(item.get('trde_qty', '0')),
+            market_cap=mac * 100_000_000 if mac else None,
+            stock_count=stock_count or None
+        ))
+    return stock_days
+
 def parse_ongoing_order(data):
     item_map = {
 
@@ -5,11 +5,13 @@ from sqlite3 import Connection
 from pykrx import stock
 from datetime import datetime
 
+from core.metrics import api_seconds, timed
 from core.schemas import Company, Kospi, StockDay
 
 from core.logger import get_logger
 logger = get_logger(__name__)
 
+@timed(api_seconds, client='pykrx')
 def get_init_stock_day_pykrx(start: str, end: str, stock_code: str) -> list[StockDay]:
     try:
         df = stock.get_market_ohlcv_by_date(start, end, stock_code)
@@ -31,6 +33,7 @@ def get_init_stock_day_pykrx(start: str, end: str, stock_code: str) -> list[Stoc
         ))
     return stock_days
 
+@timed(api_seconds, client='pykrx')
 def get_stock_day_pykrx(date: str, companies: list[Company]) -> list[StockDay]:
     data = stock.get_market_ohlcv_by_ticker(date)
     if data.empty:
@@ -52,6 +55,7 @@ def get_stock_day_pykrx(date: str, companies: list[Company]) -> list[StockDay]:
     
     return stock_days
 
+@timed(api_seconds, client='pykrx')
 def get_kospi(start: str, end: str) -> list[Kospi]:
     df = stock.get_index_ohlcv_by_date(start, end, "1001")
 
@@ -0,0 +1,122 @@
+'''
+가상 데이터 벤치마크
+
+    python -m benchmarks.run --sizes 50x250,100x500,200x750 --repeat 3
+
+결과는 JSON (기본 results/bench/bench_날짜_시간.json), 실행 사이 비교용
+'''
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import scipy
+
+from benchmarks.synthetic import create_db, generate
+from core import database
+from tools import portfolio, undervalued
+
+LAMBDAS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+
+def _time(fn, repeat: int) -> list[float]:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return times
+
+def _db_page(conn, page: int = 1, page_size: int = 25):
+    # main.db의 stock_daily 조회와 같은 경로 (전체 조회 후 페이지)
+    data = database.fetch_stock_day(conn, '0', '99999999')
+    rows = [d.__dict__ for d in data]
+    start_idx = (page - 1) * page_size
+    return rows[start_idx:start_idx + page_size]
+
+def run_size(n_stocks: int, n_days: int, repeat: int, workdir: str) -> list[dict]:
+    data = generate(n_stocks, n_days)
+    end_date = datetime.strptime(data['dates'][-1], '%Y%m%d')
+    start_date = datetime.strptime(data['dates'][0], '%Y%m%d')
+    start, end = data['dates'][0], data['dates'][-1]
+    db_path = os.path.join(workdir, f'bench_{n_stocks}x{n_days}.db')
+
+    conn = None
+    def ingest():
+        nonlocal conn
+        if conn is not None:
+            conn.close()
+        conn = create_db(db_path, data)
+
+    scenarios = [('ingest', ingest)]
+    scenarios += [
+        ('find_undervalued_assets', lambda: undervalued.find_undervalued_assets(conn, data['companies'], start_date, end_date)),
+        ('get_returns', lambda: portfolio.get_returns(conn, [c.stock_code for c in data['companies']], start, end)),
+        ('optimize_portfolio', lambda: portfolio.optimize_portfolio(conn, [c.stock_code for c in data['companies']], LAMBDAS, start_date, end_date)),
+        ('db_page', lambda: _db_page(conn, page=2)),
+    ]
+
+    results = []
+    for name, fn in scenarios:
+        times = _time(fn, repeat)
+        results.append({
+            'scenario': name,
+            'n_stocks': n_stocks,
+            'n_days': n_days,
+            'times': times,
+            'min': min(times),
+            'median': statistics.median(times),
+        })
+        print(f'{n_stocks:>5} x {n_days:<5} {name:<26} min {min(times):8.3f}s  median {statistics.median(times):8.3f}s')
+    conn.close()
+    return results
+
+def get_meta() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scipy': scipy.__version__,
+    }
+
+def parse_sizes(sizes: str) -> list[tuple[int, int]]:
+    return [tuple(int(x) for x in size.lower().split('x')) for size in sizes.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description='가상 데이터 벤치마크')
+    parser.add_argument('--sizes', default='50x250,100x500,200x750', help='종목수x거래일수, 쉼표로 구분')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', default=None, help='결과 JSON 경로')
+    parser.add_argument('--verbose', action='store_true', help='INFO 로그 출력 (시간에 로그 비용 포함)')
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_stocks, n_days in parse_sizes(args.sizes):
+            results.extend(run_size(n_stocks, n_days, args.repeat, workdir))
+
+    out = args.out or os.path.join('results', 'bench', f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump({'meta': get_meta(), 'results': results}, f, ensure_ascii=False, indent=2)
+    print(f'saved: {out}')
+
+if __name__ == '__main__':
+    main()
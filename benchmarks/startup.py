@@ -0,0 +1,88 @@
+'''
+콜드 스타트 (import main) 시간 측정
+
+    python -m benchmarks.startup --repeat 5
+
+새 프로세스에서 python -X importtime 으로 main을 import하고
+전체 시간, main이 직접 import하는 모듈별 누적 시간, 무거운 라이브러리 로드 여부를 출력
+결과는 JSON (기본 results/bench/startup_날짜_시간.json), 커밋 사이 비교용
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmarks.run import get_meta
+
+HEAVY_MODULES = ['pandas', 'numpy', 'scipy', 'matplotlib', 'pykrx']
+
+CHILD = f'''
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+'''
+
+def parse_importtime(stderr: str) -> list[tuple[str, int]]:
+    '''
+    -X importtime 출력에서 main이 직접 import한 모듈 (모듈, 누적 us)
+    '''
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2][1:]  # '|' 뒤 공백 한 칸
+        # 들여쓰기 2칸 = main 바로 아래 단계
+        if name.startswith('  ') and not name.startswith('   '):
+            modules.append((name.strip(), int(parts[1])))
+    return modules
+
+def measure(cwd: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD],
+        cwd=cwd, capture_output=True, text=True, check=True,
+        env={**os.environ, 'PYTHONPATH': cwd},
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['modules'] = sorted(parse_importtime(proc.stderr), key=lambda x: x[1], reverse=True)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='import main 콜드 스타트 시간')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='출력할 모듈 수')
+    parser.add_argument('--out', default=None, help='결과 JSON 경로')
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    runs = [measure(cwd) for _ in range(args.repeat)]
+    times = [r['seconds'] for r in runs]
+    last = runs[-1]
+
+    print(f'import main: min {min(times):.3f}s  median {statistics.median(times):.3f}s  ({args.repeat} runs)')
+    print(f"heavy modules loaded: {', '.join(last['loaded']) or '-'}")
+    for name, us in last['modules'][:args.top]:
+        print(f'  {name:<32} {us / 1e6:8.3f}s')
+
+    out = args.out or os.path.join('results', 'bench', f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': get_meta(),
+            'times': times,
+            'min': min(times),
+            'median': statistics.median(times),
+            'loaded': last['loaded'],
+            'modules': last['modules'][:args.top],
+        }, f, ensure_ascii=False, indent=2)
+    print(f'saved: {out}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from core import database
+from core.schemas import Company, Kospi, StockDay, StockYear
+
+def generate(n_stocks: int, n_days: int, end_date: datetime = None, seed: int = 0) -> dict:
+    '''
+    실제 스키마와 같은 형태의 가상 데이터 (KOSPI 기하 브라운 운동 + 종목별 beta)
+    - 거래정지 대신 약 1% 날짜를 비움 (마지막 날은 모두 있음)
+    - stock_year: 최근 6년 순이익 / 자본 / 배당
+    '''
+    rng = np.random.default_rng(seed)
+    end_date = end_date or datetime.today()
+    dates = [d.strftime('%Y%m%d') for d in pd.bdate_range(end=end_date, periods=n_days)]
+    stock_codes = [f'{i:06d}' for i in range(n_stocks)]
+
+    companies = [Company(stock_code=c, name=f'가상{c}', corp_code=f'9{c}') for c in stock_codes]
+
+    kospi_close = np.cumprod(1 + rng.normal(0.0003, 0.01, n_days)) * 2500
+    kospi = [Kospi(date=d, close_price=int(p), trade_qty=int(q)) for d, p, q in zip(dates, kospi_close, rng.integers(1e8, 1e9, n_days))]
+    market_ret = np.diff(np.log(kospi_close), prepend=np.log(kospi_close[0]))
+
+    stock_days = {}
+    for stock_code in stock_codes:
+        beta = rng.uniform(0.3, 1.5)
+        close = np.exp(np.cumsum(beta * market_ret + rng.normal(0, 0.015, n_days))) * rng.uniform(5000, 100000)
+        stock_count = int(rng.uniform(1e6, 1e8))
+        keep = rng.random(n_days) >= 0.01
+        keep[-1] = True
+        stock_days[stock_code] = [
+            StockDay(stock_code=stock_code, date=d, close_price=int(p), trade_qty=int(q), market_cap=int(p) * stock_count, stock_count=stock_count)
+            for d, p, q, k in zip(dates, close, rng.integers(1, 1e6, n_days), keep) if k
+        ]
+
+    stock_years = []
+    for stock_code in stock_codes:
+        capital = rng.uniform(1e10, 1e12)
+        for year in range(end_date.year - 6, end_date.year):
+            stock_years.append(StockYear(
+                stock_code=stock_code,
+                year=year,
+                net_profit=int(rng.normal(0.08, 0.06) * capital),
+                capital=int(capital),
+                dps=float(max(0.0, rng.normal(1000, 600)))
+            ))
+
+    return {'companies': companies, 'kospi': kospi, 'stock_days': stock_days, 'stock_years': stock_years, 'dates': dates}
+
+def create_db(db_path: str, data: dict) -> sqlite3.Connection:
+    '''
+    빈 DB에 init_db 스키마를 만들고 실제 갱신과 같은 insert 함수로 저장 (종목별 insert_stock_day)
+    '''
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    database.init_db(db_path)
+    conn = sqlite3.connect(db_path)
+    database.insert_companies(conn, data['companies'])
+    database.insert_kospi(conn, data['kospi'])
+    for stock_data in data['stock_days'].values():
+        database.insert_stock_day(conn, stock_data)
+    database.insert_stock_year(conn, data['stock_years'])
+    return conn
@@ -0,0 +1,46 @@
+import threading
+from collections import OrderedDict
+from sqlite3 import Connection
+from typing import Any, Callable, Hashable
+
+from core.database import fetch_data_version
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+class ResultCache:
+    '''
+    데이터 버전 + 파라미터를 키로 하는 분석 결과 캐시
+    DB에 insert가 일어나면 data_version이 바뀌므로 이전 결과는 자동으로 무시됨
+    반환된 결과는 공유되므로 수정하지 말 것
+    '''
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, conn: Connection, key: Hashable, compute: Callable[[], Any]):
+        version = fetch_data_version(conn)
+        full_key = (version, key)
+        with self._lock:
+            if full_key in self._data:
+                self._data.move_to_end(full_key)
+                return self._data[full_key]
+
+        result = compute()
+
+        with self._lock:
+            # 오래된 버전 결과 제거
+            for k in [k for k in self._data if k[0] != version]:
+                del self._data[k]
+            self._data[full_key] = result
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        logger.info(f'결과 캐시 저장: {key[0] if isinstance(key, tuple) else key}, 데이터 버전 {version}')
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+result_cache = ResultCache()
@@ -1,11 +1,18 @@
-import sqlite3
-import pandas as pd
+from __future__ import annotations
 
+import sqlite3
 from datetime import datetime
-from core.schemas import Company, Kospi, StockDay, StockYear
+from typing import TYPE_CHECKING
+from core.metrics import db_seconds, timed
+from core.schemas import Company, Kospi, RiskMetrics, StockDay, StockYear
+
+# pandas는 DataFrame 조회 함수에서만 사용 (import 시간 단축, 첫 호출 때 로드)
+if TYPE_CHECKING:
+    import pandas as pd
 
-def init_db():
-    conn = sqlite3.connect('data/database.db')
+@timed(db_seconds)
+def init_db(db_path: str = 'data/database.db'):
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -50,10 +57,56 @@ def init_db():
         )
     ''')
     
+    # 보유 포트폴리오 위험지표 (tools.risk), 마지막 행이 다음 날 계산의 상태
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS risk_metrics (
+            date DATETIME PRIMARY KEY,
+            portfolio_value REAL NOT NULL,
+            daily_return REAL,
+            kospi_return REAL,
+            nav REAL NOT NULL,
+            peak_nav REAL NOT NULL,
+            drawdown REAL NOT NULL,
+            volatility REAL,
+            ewma_volatility REAL,
+            beta REAL,
+            tracking_error REAL,
+            n INTEGER NOT NULL,
+            mean_return REAL NOT NULL,
+            mean_kospi REAL NOT NULL,
+            mean_active REAL NOT NULL,
+            m2_return REAL NOT NULL,
+            m2_kospi REAL NOT NULL,
+            m2_active REAL NOT NULL,
+            c_return_kospi REAL NOT NULL,
+            ewma_var REAL NOT NULL
+        )
+    ''')
+
+    # insert 함수가 호출될 때마다 증가 (결과 캐시 무효화용)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (0, 0)')
+
     conn.commit()
     conn.close()
 
+def _bump_data_version(cursor: sqlite3.Cursor):
+    cursor.execute('UPDATE data_version SET version = version + 1 WHERE id = 0')
+
+@timed(db_seconds)
+def fetch_data_version(conn: sqlite3.Connection) -> int:
+    cursor = conn.cursor()
+    cursor.execute('SELECT version FROM data_version WHERE id = 0')
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
 # INSERT (UPDATE)
+@timed(db_seconds)
 def insert_companies(conn: sqlite3.Connection, data: list[Company]):
     cursor = conn.cursor()
     cursor.executemany('''
@@ -63,8 +116,10 @@ def insert_companies(conn: sqlite3.Connection, data: list[Company]):
             name = excluded.name,
             corp_code = excluded.corp_code
     ''', [(d.stock_code, d.name, d.corp_code) for d in data])
+    _bump_data_version(cursor)
     conn.commit()
 
+@timed(db_seconds)
 def insert_kospi(conn: sqlite3.Connection, data: list[Kospi]):
     cursor = conn.cursor()
     cursor.executemany('''
@@ -73,9 +128,14 @@ def insert_kospi(conn: sqlite3.Connection, data: list[Kospi]):
         ON CONFLICT(date) DO UPDATE SET
             close_price = excluded.close_price,
             trade_qty = excluded.trade_qty
+        WHERE close_price IS NOT excluded.close_price OR trade_qty IS NOT excluded.trade_qty
     ''', [(d.date, d.close_price, d.trade_qty) for d in data])
+    # 같은 값을 다시 넣으면 (같은 날 재실행) 버전 유지
+    if cursor.rowcount > 0:
+        _bump_data_version(cursor)
     conn.commit()
     
+@timed(db_seconds)
 def insert_stock_day(conn: sqlite3.Connection, data: list[StockDay]):
     cursor = conn.cursor()
     cursor.executemany('''
@@ -86,9 +146,14 @@ def insert_stock_day(conn: sqlite3.Connection, data: list[StockDay]):
             trade_qty = excluded.trade_qty,
             market_cap = excluded.market_cap,
             stock_count = excluded.stock_count
+        WHERE close_price IS NOT excluded.close_price OR trade_qty IS NOT excluded.trade_qty
+            OR market_cap IS NOT excluded.market_cap OR stock_count IS NOT excluded.stock_count
     ''', [(d.stock_code, d.date, d.close_price, d.trade_qty, d.market_cap, d.stock_count) for d in data])
+    if cursor.rowcount > 0:
+        _bump_data_version(cursor)
     conn.commit()
 
+@timed(db_seconds)
 def insert_stock_year(conn: sqlite3.Connection, data: list[StockYear]):
     cursor = conn.cursor()
     cursor.executemany(
@@ -100,8 +165,31 @@ def insert_stock_year(conn: sqlite3.Connection, data: list[StockYear]):
             capital = excluded.capital,
             dps = excluded.dps
     ''', [(d.stock_code, d.year, d.net_profit, d.capital, d.dps) for d in data])
+    _bump_data_version(cursor)
     conn.commit()
 
+@timed(db_seconds)
+def insert_risk_metrics(conn: sqlite3.Connection, data: RiskMetrics):
+    # 종목 데이터가 아니므로 data_version은 그대로 둠
+    fields = list(RiskMetrics.__dataclass_fields__.keys())
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT OR REPLACE INTO risk_metrics ({})
+        VALUES ({})
+    '''.format(', '.join(fields), ', '.join('?' for _ in fields)), [getattr(data, f) for f in fields])
+    conn.commit()
+
+@timed(db_seconds)
+def fetch_last_date(conn: sqlite3.Connection) -> str|None:
+    '''
+    stock_daily의 마지막 거래일 (YYYYMMDD, date 열은 NUMERIC affinity라 정수로 저장됨)
+    '''
+    cursor = conn.cursor()
+    cursor.execute('SELECT MAX(date) FROM stock_daily')
+    row = cursor.fetchone()
+    return str(row[0]) if row and row[0] is not None else None
+
+@timed(db_seconds)
 def fetch_closest_date(conn: sqlite3.Connection, date: str, stock_code: str|None = None) -> datetime|None:
     cursor = conn.cursor()
     if stock_code:
@@ -114,24 +202,28 @@ def fetch_closest_date(conn: sqlite3.Connection, date: str, stock_code: str|None
     else:
         return None
  
+@timed(db_seconds)
 def fetch_all_companies(conn: sqlite3.Connection) -> list[Company]:
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM companies')
     rows = cursor.fetchall()
     return [Company(*row) for row in rows]
 
+@timed(db_seconds)
 def fetch_companies(conn: sqlite3.Connection, assets: list[str]) -> list[Company]:
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM companies WHERE stock_code IN ({})'.format(','.join('?' for _ in assets)), assets)
     rows = cursor.fetchall()
     return [Company(*row) for row in rows]
 
+@timed(db_seconds)
 def fetch_kospi(conn: sqlite3.Connection, start: str = 0, end: str = 99999999) -> list[Kospi]:
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM kospi WHERE date BETWEEN ? AND ?', (start, end))
     rows = cursor.fetchall()
     return [Kospi(*row) for row in rows]
 
+@timed(db_seconds)
 def fetch_stock_day(conn: sqlite3.Connection, start: str = 0, end: str = 99999999, stock_code: str = None, date: str = None) -> list[StockDay]:
     cursor = conn.cursor()
     query = 'SELECT * FROM stock_daily WHERE date BETWEEN ? AND ?'
@@ -146,18 +238,67 @@ def fetch_stock_day(conn: sqlite3.Connection, start: str = 0, end: str = 9999999
     rows = cursor.fetchall()
     return [StockDay(*row) for row in rows]
 
+@timed(db_seconds)
 def fetch_stock_day_by_stock(conn: sqlite3.Connection, stock_code: str, start: str, end: str) -> list[StockDay]:
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM stock_daily WHERE stock_code = ? AND date BETWEEN ? AND ?', (stock_code, start, end))
     rows = cursor.fetchall()
     return [StockDay(*row) for row in rows]
 
+@timed(db_seconds)
 def fetch_stock_day_by_date(conn: sqlite3.Connection, date: str) -> list[StockDay]:
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM stock_daily WHERE date = ?', (date,))
     rows = cursor.fetchall()
     return [StockDay(*row) for row in rows]
 
+def _fetch_stock_daily_pivot(conn: sqlite3.Connection, column: str, start: str, end: str, assets: list[str] = None) -> pd.DataFrame:
+    query = f'SELECT stock_code, date, {column} FROM stock_daily WHERE date BETWEEN ? AND ?'
+    params = [start, end]
+    if assets is not None:
+        query += ' AND stock_code IN ({})'.format(','.join('?' for _ in assets))
+        params.extend(assets)
+    import pandas as pd
+    df = pd.read_sql_query(query, conn, params=params)
+    return df.pivot(index='date', columns='stock_code', values=column).sort_index()
+
+@timed(db_seconds)
+def fetch_close_prices(conn: sqlite3.Connection, start: str, end: str, assets: list[str] = None) -> pd.DataFrame:
+    '''
+    종가를 날짜 x 종목코드 형태로 한번에 조회
+    '''
+    return _fetch_stock_daily_pivot(conn, 'close_price', start, end, assets)
+
+@timed(db_seconds)
+def fetch_market_caps(conn: sqlite3.Connection, start: str, end: str, assets: list[str] = None) -> pd.DataFrame:
+    '''
+    시가총액을 날짜 x 종목코드 형태로 한번에 조회
+    '''
+    return _fetch_stock_daily_pivot(conn, 'market_cap', start, end, assets)
+
+@timed(db_seconds)
+def fetch_stock_year_df(conn: sqlite3.Connection) -> pd.DataFrame:
+    '''
+    stock_year 전체를 DataFrame으로 조회
+    '''
+    import pandas as pd
+    return pd.read_sql_query('SELECT * FROM stock_year', conn)
+
+@timed(db_seconds)
+def fetch_last_risk_metrics(conn: sqlite3.Connection, before: str) -> RiskMetrics|None:
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM risk_metrics WHERE date < ? ORDER BY date DESC LIMIT 1', (before,))
+    row = cursor.fetchone()
+    return RiskMetrics(*row) if row else None
+
+@timed(db_seconds)
+def fetch_risk_metrics(conn: sqlite3.Connection, start: str = 0, end: str = 99999999) -> list[RiskMetrics]:
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM risk_metrics WHERE date BETWEEN ? AND ? ORDER BY date', (start, end))
+    rows = cursor.fetchall()
+    return [RiskMetrics(*row) for row in rows]
+
+@timed(db_seconds)
 def fetch_stock_year(conn: sqlite3.Connection, year: int = None, stock_code: str = None) -> list[StockYear]:
     cursor = conn.cursor()
     query = 'SELECT * FROM stock_year'
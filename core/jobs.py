@@ -0,0 +1,152 @@
+import inspect
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable
+
+from core import profiling
+from core.metrics import job_seconds
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+@dataclass
+class Job:
+    id: str
+    name: str
+    params: dict
+    status: str = 'queued'  # queued, running, done, failed
+    progress: float = 0.0
+    message: str = ''
+    result: Any = None
+    error: str|None = None
+    created: str = field(default_factory=lambda: datetime.now().isoformat(timespec='seconds'))
+    started: str|None = None
+    finished: str|None = None
+    duration: float|None = None
+    profile: bool = False
+
+class JobManager:
+    '''
+    오래 걸리는 작업(DB 초기화, 갱신, 포트폴리오)을 백그라운드 스레드에서 실행
+    - 같은 이름 + 파라미터의 작업이 대기/실행 중이면 새로 만들지 않고 기존 작업 반환
+    - 작업 함수는 progress(비율, 메시지) 콜백을 받아 진행 상황을 알림
+    - 상태가 바뀔 때마다 listener에 Job dict 전달 (websocket 전송 등)
+    DB 쓰기가 겹치지 않도록 기본 워커는 1개 (작업은 순서대로 실행)
+    '''
+    def __init__(self, max_workers: int = 1, history: int = 100):
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._active: dict[tuple, str] = {}
+        self._listeners: list[Callable[[dict], None]] = []
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._closed = False
+
+    def submit(self, name: str, fn: Callable[..., Any], profile: bool = False, **params) -> Job:
+        '''
+        fn(progress, **params) 실행, 이미 같은 작업이 있으면 그 작업 반환
+        profile=True 이거나 PROFILE_JOBS에 있는 작업이면 cProfile 결과를 results/profiles/ 에 저장
+        profile은 중복 판단에 쓰지 않음 (같은 작업을 동시에 두 번 실행하지 않음)
+        - 기존 작업이 대기 중이면 그 작업을 프로파일링
+        - 이미 실행 중이면 프로파일링 없이 그 작업 반환 (job.profile이 False)
+        params는 fn 기본값을 채워서 비교 (submit(..., force=False)와 생략한 호출이 같은 작업)
+        '''
+        bound = inspect.signature(fn).bind(None, **params)
+        bound.apply_defaults()
+        params = dict(list(bound.arguments.items())[1:])
+        key = (name, tuple(sorted(params.items())))
+        with self._lock:
+            if key in self._active:
+                job = self._jobs[self._active[key]]
+                if profile and job.status == 'queued':
+                    job.profile = True
+                logger.info(f'이미 진행 중인 작업: {name} ({job.id})')
+                return job
+            job = Job(id=uuid.uuid4().hex[:12], name=name, params=params, profile=profile or name in profiling.get_profiled_jobs())
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+            # 끝난 작업만 오래된 순서로 정리
+            for job_id in [j.id for j in self._jobs.values() if j.finished][:max(0, len(self._jobs) - self.history)]:
+                del self._jobs[job_id]
+        self._notify(job)
+        self._executor.submit(self._run, job, key, fn)
+        return job
+
+    def _run(self, job: Job, key: tuple, fn: Callable[..., Any]):
+        started = time.perf_counter()
+        self._update(job, status='running', started=datetime.now().isoformat(timespec='seconds'))
+        logger.info(f'작업 시작: {job.name} ({job.id})')
+        try:
+            with profiling.profile(job.name, enabled=job.profile, tag=job.id) as profiler:
+                if job.profile and profiler is None:
+                    self._update(job, profile=False)  # 다른 프로파일링 진행 중
+                result = fn(lambda progress, message='': self._update(job, progress=progress, message=message), **job.params)
+            changes = {'status': 'done', 'progress': 1.0, 'result': result}
+            logger.info(f'작업 완료: {job.name} ({job.id}), {time.perf_counter() - started:.1f}초')
+        except Exception as e:
+            changes = {'status': 'failed', 'error': str(e)}
+            logger.error(f'작업 실패: {job.name} ({job.id}): {e}')
+        with self._lock:
+            self._active.pop(key, None)
+        job_seconds.observe(time.perf_counter() - started, job=job.name, status=changes['status'])
+        self._update(job, finished=datetime.now().isoformat(timespec='seconds'), duration=time.perf_counter() - started, **changes)
+
+    def _update(self, job: Job, **changes):
+        with self._lock:
+            for k, v in changes.items():
+                setattr(job, k, v)
+            if 'finished' in changes:
+                self._finished.notify_all()
+        self._notify(job)
+
+    def _notify(self, job: Job):
+        data = self.to_dict(job)
+        for listener in self._listeners[:]:
+            try:
+                listener(data)
+            except Exception as e:
+                logger.error(f'작업 이벤트 전달 오류: {e}')
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[dict], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def wait(self, job_id: str, timeout: float = None) -> Job|None:
+        '''
+        작업이 끝날 때까지 (또는 timeout, shutdown) 대기, 스케줄러처럼 같은 프로세스에서 결과가 필요할 때
+        끝나지 않았으면 job.finished가 None
+        '''
+        with self._finished:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._finished.wait_for(lambda: job.finished or self._closed, timeout)
+            return job
+
+    def get(self, job_id: str) -> Job|None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> list[Job]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def to_dict(self, job: Job) -> dict:
+        with self._lock:
+            return asdict(job)
+
+    def shutdown(self):
+        with self._finished:
+            self._closed = True
+            self._finished.notify_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+job_manager = JobManager()
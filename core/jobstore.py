@@ -0,0 +1,121 @@
+import pickle
+import sqlite3
+import threading
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+class SQLiteJobStore(BaseJobStore):
+    '''
+    APScheduler job store (SQLAlchemyJobStore와 같은 방식, 표준 sqlite3만 사용)
+    예약 작업과 다음 실행 시각이 파일에 남으므로 재시작 / 리더 교체 후에도
+    놓친 실행(misfire)과 예약된 재시도가 이어짐
+    '''
+    def __init__(self, db_path: str, tablename: str = 'apscheduler_jobs', pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.db_path = db_path
+        self.tablename = tablename
+        self.pickle_protocol = pickle_protocol
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        with self._lock, self._get_conn() as conn:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.tablename} (
+                    id TEXT PRIMARY KEY,
+                    next_run_time REAL,
+                    job_state BLOB NOT NULL
+                )
+            ''')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS ix_{self.tablename}_next_run_time ON {self.tablename} (next_run_time)')
+
+    def shutdown(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        # shutdown 직후 스케줄러 스레드가 한번 더 조회할 수 있으므로 필요하면 다시 연결
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def _query(self, query: str, params: tuple = ()) -> list[tuple]:
+        with self._lock, self._get_conn() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def _execute(self, query: str, params: tuple = ()) -> int:
+        with self._lock, self._get_conn() as conn:
+            return conn.execute(query, params).rowcount
+
+    def lookup_job(self, job_id):
+        rows = self._query(f'SELECT job_state FROM {self.tablename} WHERE id = ?', (job_id,))
+        return self._reconstitute_job(rows[0][0]) if rows else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs('WHERE next_run_time <= ?', (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        rows = self._query(f'SELECT next_run_time FROM {self.tablename} WHERE next_run_time IS NOT NULL ORDER BY next_run_time LIMIT 1')
+        return utc_timestamp_to_datetime(rows[0][0]) if rows else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        try:
+            self._execute(
+                f'INSERT INTO {self.tablename} (id, next_run_time, job_state) VALUES (?, ?, ?)',
+                (job.id, datetime_to_utc_timestamp(job.next_run_time), pickle.dumps(job.__getstate__(), self.pickle_protocol))
+            )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        rowcount = self._execute(
+            f'UPDATE {self.tablename} SET next_run_time = ?, job_state = ? WHERE id = ?',
+            (datetime_to_utc_timestamp(job.next_run_time), pickle.dumps(job.__getstate__(), self.pickle_protocol), job.id)
+        )
+        if rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        if self._execute(f'DELETE FROM {self.tablename} WHERE id = ?', (job_id,)) == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        self._execute(f'DELETE FROM {self.tablename}')
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where: str = '', params: tuple = ()):
+        # next_run_time이 NULL(일시정지)인 작업은 뒤로
+        rows = self._query(f'SELECT id, job_state FROM {self.tablename} {where} ORDER BY next_run_time IS NULL, next_run_time', params)
+        jobs = []
+        failed_job_ids = []
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except BaseException:
+                # 함수 경로가 바뀌는 등 복원할 수 없는 작업은 삭제
+                self._logger.exception(f'Unable to restore job "{job_id}" -- removing it')
+                failed_job_ids.append(job_id)
+        for job_id in failed_job_ids:
+            self._execute(f'DELETE FROM {self.tablename} WHERE id = ?', (job_id,))
+        return jobs
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} (db_path={self.db_path})>'
@@ -0,0 +1,140 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+class LeaderElection:
+    '''
+    여러 워커 프로세스 중 하나만 역할(스케줄러 등)을 맡도록 SQLite 임대(lease)로 선출
+    - leader 테이블에 (역할, 소유자, 마지막 heartbeat) 한 줄
+    - interval마다 heartbeat 갱신, ttl 동안 갱신이 없으면 (프로세스 종료 등) 다른 워커가 가져감
+    - 리더가 되면 on_elected, 리더를 잃으면 on_demoted 호출 (heartbeat 스레드에서)
+      on_elected가 실패하면 리더가 아님 (on_demoted로 정리하고 임대 반납), on_demoted는 여러 번 호출되어도 안전해야 함
+    갱신 작업(긴 쓰기 트랜잭션)에 heartbeat가 막히지 않도록 데이터 DB와 다른 파일 사용
+    '''
+    def __init__(self, name: str, on_elected: Callable[[], None], on_demoted: Callable[[], None],
+                 db_path: str = 'data/leader.db', ttl: float = 30.0, interval: float = 10.0):
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.db_path = db_path
+        self.ttl = ttl
+        self.interval = interval
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.interval, isolation_level=None)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS leader (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                heartbeat REAL NOT NULL
+            )
+        ''')
+        return conn
+
+    def try_acquire(self) -> bool:
+        '''
+        임대가 비었거나 만료되었거나 이미 내 것이면 갱신하고 True
+        '''
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT owner, heartbeat FROM leader WHERE name = ?', (self.name,)).fetchone()
+            if row is None or row[0] == self.owner or now - row[1] > self.ttl:
+                conn.execute('INSERT OR REPLACE INTO leader (name, owner, heartbeat) VALUES (?, ?, ?)', (self.name, self.owner, now))
+                conn.execute('COMMIT')
+                return True
+            conn.execute('ROLLBACK')
+            return False
+        finally:
+            conn.close()
+
+    def release(self):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM leader WHERE name = ? AND owner = ?', (self.name, self.owner))
+        finally:
+            conn.close()
+
+    def get_leader(self) -> dict|None:
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT owner, heartbeat FROM leader WHERE name = ?', (self.name,)).fetchone()
+        finally:
+            conn.close()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return {'owner': row[0], 'heartbeat': row[1]}
+
+    def _tick(self):
+        try:
+            acquired = self.try_acquire()
+        except sqlite3.Error as e:
+            # 갱신 실패가 ttl 넘게 이어지면 다른 워커가 가져갈 수 있으므로 리더 자리를 내려놓음
+            logger.error(f'리더 heartbeat 실패 ({self.name}): {e}')
+            acquired = False
+        if acquired and not self.is_leader:
+            logger.info(f'리더 선출: {self.name} ({self.owner})')
+            try:
+                self.on_elected()
+            except Exception as e:
+                # 역할을 시작하지 못하면 리더가 아님 -> 일부 시작된 것 정리 후 임대 반납 (다음 heartbeat에서 다시 시도)
+                logger.error(f'리더 역할 시작 실패 ({self.name}): {e}')
+                self._abandon()
+                return
+            self.is_leader = True
+        elif not acquired and self.is_leader:
+            self.is_leader = False
+            logger.warning(f'리더 상실: {self.name} ({self.owner})')
+            self.on_demoted()
+
+    def _abandon(self):
+        try:
+            self.on_demoted()
+        except Exception as e:
+            logger.error(f'리더 역할 정리 실패 ({self.name}): {e}')
+        try:
+            self.release()
+        except sqlite3.Error as e:
+            logger.error(f'리더 반납 실패 ({self.name}): {e}')
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._tick()
+            except Exception as e:
+                logger.error(f'리더 선출 오류 ({self.name}): {e}')
+            self._stop.wait(self.interval)
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'leader-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        '''
+        heartbeat를 멈추고 리더였다면 on_demoted 후 임대 반납 (다른 워커가 ttl을 기다리지 않고 가져감)
+        '''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.is_leader:
+            self.is_leader = False
+            self.on_demoted()
+            try:
+                self.release()
+            except sqlite3.Error as e:
+                logger.error(f'리더 반납 실패 ({self.name}): {e}')
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+
+class LogBroadcaster(logging.Handler):
+    '''
+    로그 레코드를 메모리 링 버퍼에 저장하고 구독 중인 모든 websocket에 전달
+    - 파일을 다시 읽지 않으므로 클라이언트 수와 관계없이 로그 한 줄당 비용은 같음
+    - 새 클라이언트는 버퍼(history 줄)를 먼저 받음
+    - 클라이언트별 큐는 queue_size로 제한, 넘치면 오래된 줄부터 버리고 건너뛴 줄 수를 알림
+    emit은 어느 스레드에서나 호출되며 전달은 attach한 이벤트 루프에서 처리
+    '''
+    def __init__(self, history: int = 1000, queue_size: int = 1000, level=logging.INFO):
+        super().__init__(level)
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history)
+        self._pending = []
+        self._subscribers: dict[asyncio.Queue, int] = {}  # 큐 -> 버린 줄 수
+        self._loop = None
+        self._buffer_lock = threading.Lock()
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def detach(self):
+        self._loop = None
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self._push((False, line), history=line)
+
+    def publish_event(self, text: str):
+        '''
+        로그가 아닌 메시지 (작업 진행 상황 등), 버퍼에 남기지 않음
+        '''
+        self._push((True, text))
+
+    def _push(self, item: tuple[bool, str], history: str = None):
+        with self._buffer_lock:
+            if history is not None:
+                self._history.append(history)
+            if self._loop is None:
+                return
+            schedule = not self._pending
+            self._pending.append(item)
+        if schedule:
+            # 루프에 한번만 예약하고 그 사이 쌓인 줄은 같이 전달
+            try:
+                self._loop.call_soon_threadsafe(self._fanout)
+            except RuntimeError:  # 루프 종료
+                with self._buffer_lock:
+                    self._pending.clear()
+
+    def _fanout(self):
+        with self._buffer_lock:
+            items, self._pending = self._pending, []
+        for queue in list(self._subscribers):
+            for item in items:
+                if queue.full():
+                    queue.get_nowait()
+                    self._subscribers[queue] += 1
+                queue.put_nowait(item)
+
+    def subscribe(self) -> tuple[asyncio.Queue, list[str]]:
+        '''
+        이벤트 루프에서 호출, (큐, 지금까지의 로그) 반환
+        '''
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[queue] = 0
+        with self._buffer_lock:
+            history = list(self._history)
+        return queue, history
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.pop(queue, None)
+
+    async def get_batch(self, queue: asyncio.Queue) -> list[str]:
+        '''
+        다음 전송 단위: 연속된 로그 줄은 하나로 묶고 이벤트는 따로
+        '''
+        items = [await queue.get()]
+        while not queue.empty() and not items[-1][0]:
+            items.append(queue.get_nowait())
+        messages = []
+        dropped = self._subscribers.get(queue, 0)
+        if dropped:
+            self._subscribers[queue] = 0
+            messages.append(f'... {dropped}줄 생략 (전송 지연)')
+        lines = []
+        for is_event, text in items:
+            if is_event:
+                if lines:
+                    messages.append('\n'.join(lines))
+                    lines = []
+                messages.append(text)
+            else:
+                lines.append(text)
+        if lines:
+            messages.append('\n'.join(lines))
+        return messages
+
+log_broadcaster = LogBroadcaster()
@@ -1,47 +1,271 @@
+import atexit
+import copy
+import json
 import logging
 import logging.handlers
+import multiprocessing
+import os
+import queue
+import threading
 from pathlib import Path
 
+from core.log_stream import log_broadcaster
+
 log_dir = Path("log")
 log_dir.mkdir(exist_ok=True)
-log_file = log_dir / "log.log"
-console_file = log_dir / "console.log"
-
-rotating_handler = logging.handlers.RotatingFileHandler(
-    log_file,
-    mode='a',
-    maxBytes=2*1024*1024,
-    backupCount=5,
-    encoding='utf-8'
-)
+# uvicorn 워커가 여러 개면 (main에서 LOG_PER_PROCESS 설정) 프로세스별 파일
+# 파일 하나를 여러 프로세스가 rotation하면 서로 다른 파일에 쓰거나 로그가 사라짐
+log_file = log_dir / (f"log.{os.getpid()}.jsonl" if os.getenv('LOG_PER_PROCESS') else "log.jsonl")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+class JsonFormatter(logging.Formatter):
+    '''
+    한 줄에 JSON 하나 (시간, 레벨, 로거, 스레드, 메시지)
+    '''
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+class BatchRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    '''
+    emit 안에서는 flush하지 않음 (BatchLogWriter가 묶음마다 flush 호출)
+    emit 밖에서 호출한 flush / close는 그대로 기록
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._in_emit = False
+
+    def emit(self, record):
+        # handle()이 lock을 잡은 상태에서 호출
+        self._in_emit = True
+        try:
+            super().emit(record)
+        finally:
+            self._in_emit = False
+
+    def flush(self):
+        with self.lock:
+            if not self._in_emit:
+                super().flush()
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    '''
+    메시지만 완성하고 나머지 포맷(시간, JSON 등)은 listener 스레드에서 처리
+    traceback은 exc_text로 남겨 각 formatter가 사용
+    '''
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+_exc_formatter = logging.Formatter()
 
-# File handler for console.log (captures console output)
-console_file_handler = logging.FileHandler(console_file, mode='a', encoding='utf-8')
-console_file_handler.setLevel(logging.INFO)
-console_file_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+class BatchLogWriter:
+    '''
+    log_queue를 비우는 쓰기 스레드 (QueueListener와 같은 역할)
+    큐에 쌓인 레코드를 최대 batch_size개씩 꺼내 handler로 보낸 뒤 handler마다 한번만 flush
+    '''
+    _sentinel = None
+
+    def __init__(self, queue, *handlers, batch_size: int = 256):
+        self.queue = queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def is_alive(self) -> bool:
+        # fork로 만든 자식 프로세스에서는 스레드가 복사되지 않으므로 False
+        return self._thread is not None and self._thread.is_alive()
+
+    def handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                    continue
+                self.handle(record)
+            for handler in self.handlers:
+                handler.flush()
+
+    def stop(self):
+        '''
+        남은 레코드를 모두 기록하고 종료
+        '''
+        if self._thread is None:
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
 
 # Suppress httpx logs only in the console
 class HttpxFilter(logging.Filter):
     def filter(self, record):
         return not record.name.startswith("httpx")
 
-console_handler.addFilter(HttpxFilter())
-console_file_handler.addFilter(HttpxFilter())
+def get_handlers(file_path: Path = log_file) -> list[logging.Handler]:
+    '''
+    실제로 쓰는 handler: JSON 파일, 콘솔, Web UI live log
+    '''
+    # delay: 처음 기록할 때 파일을 엶 (로그를 부모로 보내는 자식 프로세스는 열지 않음)
+    file_handler = BatchRotatingFileHandler(
+        file_path,
+        mode='a',
+        maxBytes=2*1024*1024,
+        backupCount=5,
+        encoding='utf-8',
+        delay=True
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    # Web UI live log (메모리 링 버퍼 -> websocket)
+    log_broadcaster.setLevel(logging.INFO)
+    log_broadcaster.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    console_handler.addFilter(HttpxFilter())
+    log_broadcaster.addFilter(HttpxFilter())
+    return [file_handler, console_handler, log_broadcaster]
+
+# 호출 스레드는 큐에 넣기만 하고 파일/콘솔 쓰기는 listener 스레드에서 처리
+log_queue = queue.SimpleQueue()
+queue_listener = BatchLogWriter(log_queue, *get_handlers())
+queue_listener.start()
+atexit.register(queue_listener.stop)  # 남은 레코드 기록
 
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        rotating_handler,
-        console_handler,
-        console_file_handler
-    ]
+    handlers=[LogQueueHandler(log_queue)]
 )
 
+# 자식 프로세스(ProcessPoolExecutor 워커)의 로그도 이 프로세스의 쓰기 스레드 하나가 기록
+# 부모: initargs=(get_worker_log_queue(),), 자식: initializer에서 init_worker_logging(queue)
+_worker_queue = None
+_worker_drain = None
+_worker_lock = threading.Lock()
+
+def _drain_worker_queue(worker_queue):
+    while True:
+        try:
+            record = worker_queue.get()
+        except (EOFError, OSError):
+            return
+        if record is None:
+            return
+        log_queue.put(record)
+
+def _stop_worker_drain():
+    global _worker_queue, _worker_drain
+    with _worker_lock:
+        if _worker_queue is None:
+            return
+        _worker_queue.put(None)
+        _worker_drain.join()
+        _worker_queue.close()
+        _worker_queue, _worker_drain = None, None
+
+def get_worker_log_queue():
+    '''
+    자식 프로세스용 로그 큐 (프로세스 간 큐, 처음 호출할 때 생성)
+    spawn / fork 어느 쪽 풀에도 넘길 수 있도록 spawn context로 만듦
+    '''
+    global _worker_queue, _worker_drain
+    with _worker_lock:
+        if _worker_queue is None:
+            _worker_queue = multiprocessing.get_context('spawn').Queue()
+            _worker_drain = threading.Thread(target=_drain_worker_queue, args=(_worker_queue,), name='log-worker-drain', daemon=True)
+            _worker_drain.start()
+            atexit.register(_stop_worker_drain)  # 쓰기 스레드 종료(먼저 등록)보다 먼저 실행
+        return _worker_queue
+
+def init_worker_logging(worker_queue):
+    '''
+    자식 프로세스에서 루트 로거가 부모의 큐로 보내도록 설정 (pool initializer에서 호출)
+    spawn으로 이 모듈을 다시 import하면서 시작한 쓰기 스레드는 멈춤 (파일은 열지 않았음)
+    '''
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(LogQueueHandler(worker_queue))
+    if queue_listener.is_alive():
+        queue_listener.stop()
+
+def measure_log_overhead(n: int = 10000) -> dict:
+    '''
+    같은 handler 구성으로 로그 한번 호출에 걸리는 시간 (μs)
+    - sync: 호출 스레드에서 파일 + 콘솔(StringIO) 직접 기록
+    - queue: QueueHandler로 넣기만 함 (listener가 끝날 때까지 기다린 총 시간도 같이 기록)
+    '''
+    import io
+    import tempfile
+    import time
+
+    result = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('sync', 'queue'):
+            # sync: 기존처럼 emit마다 flush
+            handler_class = logging.handlers.RotatingFileHandler if mode == 'sync' else BatchRotatingFileHandler
+            file_handler = handler_class(Path(tmp) / f'{mode}.jsonl', maxBytes=2*1024*1024, backupCount=1, encoding='utf-8')
+            file_handler.setFormatter(JsonFormatter())
+            console_handler = logging.StreamHandler(io.StringIO())
+            console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+            handlers = [file_handler, console_handler]
+
+            bench_logger = logging.Logger(f'log_overhead_{mode}')
+            listener = None
+            if mode == 'sync':
+                for handler in handlers:
+                    bench_logger.addHandler(handler)
+            else:
+                bench_queue = queue.SimpleQueue()
+                listener = BatchLogWriter(bench_queue, *handlers)
+                listener.start()
+                bench_logger.addHandler(LogQueueHandler(bench_queue))
+
+            started = time.perf_counter()
+            for i in range(n):
+                bench_logger.info('측정 로그 %d: %s', i, 'company')
+            elapsed = time.perf_counter() - started
+            if listener is not None:
+                listener.stop()
+            total = time.perf_counter() - started
+            for handler in handlers:
+                handler.close()
+            result[mode] = {'per_call_us': elapsed / n * 1e6, 'total_s': total}
+    return result
 
 def get_logger(name: str = __name__):
     return logging.getLogger(name)
@@ -54,10 +278,11 @@ def get_scheduler_logger(name: str = "scheduler"):
         mode='a',
         maxBytes=2*1024*1024,
         backupCount=3,
-        encoding='utf-8'
+        encoding='utf-8',
+        delay=True  # 스케줄러 로그는 리더 워커만 기록
     )
     scheduler_handler.setLevel(logging.INFO)
-    scheduler_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    scheduler_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
     logger = logging.getLogger(name)
     # Avoid duplicate handlers
     if not any(isinstance(h, logging.handlers.RotatingFileHandler) and h.baseFilename == str(scheduler_log_file) for h in logger.handlers):
@@ -0,0 +1,134 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _label_key(labelnames: frozenset, name: str, labels: dict) -> tuple:
+    # 지표마다 라벨 이름은 고정 (Prometheus에서 시계열마다 라벨 구성이 다르면 합산 / 비교가 안 됨)
+    if labels.keys() != labelnames:
+        raise ValueError(f'{name}: labels {sorted(labels)} != {sorted(labelnames)}')
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    items = key + extra
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = frozenset(labels)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, self.name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {_format_value(value)}')
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = frozenset(labels)
+        self.buckets = tuple(sorted(buckets))
+        # 라벨별 [구간별 개수(누적 아님) + inf, 합계]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, self.name, labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            counts[i] += 1
+            self._values[key][1] = total + value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(counts), total) for key, (counts, total) in self._values.items())
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(key, (("le", le),))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {total!r}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {cumulative}')
+        return lines
+
+class MetricsRegistry:
+    '''
+    Prometheus text format (/metrics) 로 내보내는 프로세스 내 지표
+    '''
+    def __init__(self):
+        self._metrics: dict[str, Counter|Histogram] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+registry = MetricsRegistry()
+
+db_seconds = registry.histogram('stock_db_call_seconds', 'SQLite fetch/insert function duration', ('function',))
+api_seconds = registry.histogram('stock_api_call_seconds', 'External API (pykrx, DART, Kiwoom) call duration', ('client', 'function'))
+stage_seconds = registry.histogram('stock_stage_seconds', 'Analysis stage duration (screen, returns, covariance, optimize, render)', ('stage', 'function'))
+job_seconds = registry.histogram('stock_job_seconds', 'Background job duration', ('job', 'status'))
+pipeline_seconds = registry.histogram('stock_pipeline_stage_seconds', 'Post-close pipeline stage duration (skipped stages not observed)', ('pipeline', 'stage'))
+errors_total = registry.counter('stock_errors_total', 'Exceptions raised by instrumented functions', ('metric', 'function'))
+
+def timed(histogram: Histogram, **labels):
+    '''
+    함수 실행 시간을 histogram에 기록 (라벨에 function 추가), 예외는 errors_total
+    timed 함수 안에서 같은 histogram의 timed 함수를 부르면 두 번 기록되므로 안쪽은 timed 없는 함수를 호출
+    '''
+    def decorator(fn):
+        fn_labels = {**labels, 'function': fn.__name__}
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                errors_total.inc(metric=histogram.name, function=fn.__name__)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, **fn_labels)
+        return wrapper
+    return decorator
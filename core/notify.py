@@ -0,0 +1,19 @@
+import httpx
+import os
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+def send_discord_webhook(content):
+    try:
+        url = os.getenv("WEBHOOK_URL")
+        if not url:  # ignore
+            return
+        payload = {"content": content}
+        response = httpx.post(url, json=payload)
+        if response.status_code == 204:
+            return
+        else:
+            logger.error(f"Discord webhook failed: {response.status_code} {response.text}")
+    except Exception as e:
+        logger.error(f"Discord webhook error: {e}")
@@ -0,0 +1,163 @@
+import json
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable
+
+from core.metrics import pipeline_seconds
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+@dataclass
+class Stage:
+    '''
+    fn(outputs) -> 출력 dict (JSON으로 저장 가능해야 함), outputs는 지금까지 끝난 단계의 {이름: 출력}
+    key(outputs) -> 입력 fingerprint, 마지막으로 성공한 실행과 같으면 건너뛰고 저장된 출력 사용
+    key가 None이면 항상 실행
+    '''
+    name: str
+    fn: Callable[[dict], dict]
+    deps: list[str] = field(default_factory=list)
+    key: Callable[[dict], Any]|None = None
+
+class Pipeline:
+    '''
+    단계(Stage) DAG 실행기
+    - 선행 단계가 모두 끝난 단계는 스레드 풀에서 같이 실행 (독립된 단계는 병렬)
+    - 단계가 실패하면 그 단계에 의존하는 단계만 취소, 나머지는 계속
+    - 단계별 key와 출력은 db_path에 저장되므로 재시작 / 재시도 후에도 바뀌지 않은 단계는 건너뜀
+    '''
+    def __init__(self, name: str, stages: list[Stage], db_path: str = 'data/scheduler.db', max_workers: int = 2):
+        self.name = name
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.stages = self._sort(stages)
+
+    @staticmethod
+    def _sort(stages: list[Stage]) -> list[Stage]:
+        by_name = {stage.name: stage for stage in stages}
+        order, visiting, done = [], set(), set()
+        def visit(stage: Stage):
+            if stage.name in done:
+                return
+            if stage.name in visiting:
+                raise ValueError(f'순환 의존: {stage.name}')
+            visiting.add(stage.name)
+            for dep in stage.deps:
+                if dep not in by_name:
+                    raise ValueError(f'없는 단계: {stage.name} -> {dep}')
+                visit(by_name[dep])
+            visiting.discard(stage.name)
+            done.add(stage.name)
+            order.append(stage)
+        for stage in stages:
+            visit(stage)
+        return order
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS pipeline_stages (
+                pipeline TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                key TEXT NOT NULL,
+                output TEXT NOT NULL,
+                finished TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                PRIMARY KEY (pipeline, stage)
+            )
+        ''')
+        return conn
+
+    def _load_state(self) -> dict[str, tuple[str, str]]:
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT stage, key, output FROM pipeline_stages WHERE pipeline = ?', (self.name,)).fetchall()
+        finally:
+            conn.close()
+        return {stage: (key, output) for stage, key, output in rows}
+
+    def _save_state(self, stage: str, key: str, output: str, seconds: float):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO pipeline_stages (pipeline, stage, key, output, finished, seconds) VALUES (?, ?, ?, ?, ?, ?)',
+                    (self.name, stage, key, output, datetime.now().isoformat(timespec='seconds'), seconds)
+                )
+        finally:
+            conn.close()
+
+    def _run_stage(self, stage: Stage, outputs: dict, saved: tuple[str, str]|None, force: bool) -> tuple[dict, dict|None]:
+        started = time.perf_counter()
+        try:
+            key = None if stage.key is None else json.dumps(stage.key(outputs), default=str, sort_keys=True)
+            if key is not None and not force and saved is not None and saved[0] == key:
+                logger.info(f'[{self.name}] {stage.name}: 입력 변경 없음, 건너뜀')
+                return {'status': 'skipped', 'seconds': 0.0}, json.loads(saved[1])
+
+            output = stage.fn(outputs) or {}
+            seconds = time.perf_counter() - started
+            if key is not None:
+                self._save_state(stage.name, key, json.dumps(output, ensure_ascii=False, default=str), seconds)
+        except Exception as e:
+            seconds = time.perf_counter() - started
+            logger.error(f'[{self.name}] {stage.name} 실패 ({seconds:.2f}초): {e}')
+            return {'status': 'failed', 'seconds': seconds, 'error': str(e)}, None
+        pipeline_seconds.observe(seconds, pipeline=self.name, stage=stage.name)
+        logger.info(f'[{self.name}] {stage.name}: {seconds:.2f}초')
+        return {'status': 'done', 'seconds': seconds}, output
+
+    def run(self, force: bool = False, progress: Callable[[float, str], None] = None) -> dict:
+        '''
+        force=True면 key가 같아도 모든 단계 실행
+        반환: {'status': done|failed, 'seconds', 'stages': {이름: {status, seconds, error}}, 'outputs': {이름: 출력}}
+        '''
+        report = progress or (lambda *_: None)
+        started = time.perf_counter()
+        state = self._load_state()
+        outputs: dict[str, dict] = {}
+        results: dict[str, dict] = {}
+        pending = [stage for stage in self.stages]
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f'pipeline-{self.name}') as executor:
+            while True:
+                # 위상 정렬 순서라 한번 훑으면 취소가 끝까지 전파됨
+                for stage in pending[:]:
+                    states = [results.get(dep, {}).get('status') for dep in stage.deps]
+                    if any(s in ('failed', 'cancelled') for s in states):
+                        results[stage.name] = {'status': 'cancelled', 'seconds': 0.0}
+                        pending.remove(stage)
+                    elif all(s in ('done', 'skipped') for s in states):
+                        future = executor.submit(self._run_stage, stage, dict(outputs), state.get(stage.name), force)
+                        running[future] = stage.name
+                        pending.remove(stage)
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    results[name], output = future.result()
+                    if output is not None:
+                        outputs[name] = output
+                    report(len(results) / len(self.stages), name)
+
+        status = 'done' if all(r['status'] in ('done', 'skipped') for r in results.values()) else 'failed'
+        seconds = time.perf_counter() - started
+        summary = ', '.join(
+            f"{stage.name} {results[stage.name]['seconds']:.2f}s" if results[stage.name]['status'] == 'done'
+            else f"{stage.name} {results[stage.name]['status']}"
+            for stage in self.stages
+        )
+        log = logger.info if status == 'done' else logger.error
+        log(f'[{self.name}] {status} ({seconds:.1f}초): {summary}')
+        return {
+            'status': status,
+            'seconds': seconds,
+            'stages': {stage.name: results[stage.name] for stage in self.stages},
+            'outputs': outputs,
+        }
@@ -0,0 +1,82 @@
+import cProfile
+import os
+import pstats
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+PROFILE_DIR = Path('results') / 'profiles'
+
+# cProfile은 한번에 하나만 (겹치면 나중 요청은 프로파일링 없이 실행)
+_profile_lock = threading.Lock()
+
+def get_profiled_jobs() -> set[str]:
+    '''
+    PROFILE_JOBS 환경변수 (쉼표 구분 작업 이름), 예약 작업을 재시작 없이 프로파일링할 때
+    '''
+    return {name.strip() for name in os.getenv('PROFILE_JOBS', '').split(',') if name.strip()}
+
+@contextmanager
+def profile(name: str, enabled: bool = True, tag: str = None):
+    '''
+    with profile('portfolio', enabled=flag, tag=job_id) as profiler: ...
+    현재 스레드의 실행을 cProfile로 기록하고 results/profiles/ 에 .prof (pstats) + .txt 요약 저장
+    enabled=False거나 다른 프로파일링이 진행 중이면 아무것도 하지 않음 (profiler None)
+    '''
+    if not enabled or not _profile_lock.acquire(blocking=False):
+        if enabled:
+            logger.warning(f'다른 프로파일링 진행 중, 건너뜀: {name}')
+        yield None
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        _profile_lock.release()
+        try:
+            save_profile(profiler, name, tag)
+        except OSError as e:
+            logger.error(f'프로파일 저장 실패: {name}: {e}')
+
+def save_profile(profiler: cProfile.Profile, name: str, tag: str = None) -> Path:
+    '''
+    파일 이름: 이름_날짜_시간[_tag] (같은 초에 끝난 작업끼리 덮어쓰지 않도록 작업 id를 tag로)
+    '''
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stem = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    if tag:
+        stem = f'{stem}_{tag}'
+    prof_path = PROFILE_DIR / f'{stem}.prof'
+    profiler.dump_stats(prof_path)
+    # 브라우저에서 바로 볼 수 있는 요약 (누적 시간 상위 60개)
+    with open(PROFILE_DIR / f'{stem}.txt', 'w', encoding='utf-8') as f:
+        pstats.Stats(profiler, stream=f).strip_dirs().sort_stats('cumulative').print_stats(60)
+    logger.info(f'프로파일 저장: {prof_path}')
+    return prof_path
+
+def list_profiles() -> list[dict]:
+    if not PROFILE_DIR.exists():
+        return []
+    profiles = []
+    with os.scandir(PROFILE_DIR) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.prof'):
+                continue
+            stem = entry.name[:-len('.prof')]
+            stat = entry.stat()
+            profiles.append({
+                'name': stem,
+                'created': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                'size': stat.st_size,
+                'prof_url': f'/results/profiles/{entry.name}',
+                'text_url': f'/results/profiles/{stem}.txt',
+            })
+    profiles.sort(key=lambda x: x['created'], reverse=True)
+    return profiles
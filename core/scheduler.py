@@ -1,46 +1,146 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-import httpx
+from apscheduler.triggers.cron import CronTrigger
+from datetime import datetime, timedelta
 import os
+import sqlite3
+import time
 
+from core.jobs import job_manager
+from core.jobstore import SQLiteJobStore
+from core.notify import send_discord_webhook
+from core.tasks import run_post_close
 from core.logger import get_scheduler_logger
 logger = get_scheduler_logger()
 
-def send_discord_webhook(content):
+# 예약 작업, 재시도, 실행 기록 (데이터 DB와 분리)
+SCHEDULER_DB = 'data/scheduler.db'
+UPDATE_JOB_ID = 'update_today'
+UPDATE_TRIGGER = CronTrigger(hour=7, minute=0)
+# 07:00에 서버가 꺼져 있었으면 이 시간(초) 안에 켜질 때 한번 실행
+MISFIRE_GRACE_TIME = 6 * 3600
+# 실패 시 재시도 간격(초), 길이만큼 재시도
+RETRY_DELAYS = [5 * 60, 15 * 60, 45 * 60]
+UPDATE_TIMEOUT = 3600
+
+def trigger_update_today(attempt: int = 1):
+    '''
+    장 마감 파이프라인 (가격 갱신 -> 위험지표, 저평가 -> 최적화 -> 차트 -> 알림, core.tasks)을
+    이 프로세스의 job_manager에서 실행하고 끝날 때까지 대기 (HTTP 호출 없음)
+    실패하면 RETRY_DELAYS 후 재시도를 job store에 예약 (재시작해도 유지, 끝난 단계는 건너뜀)
+    '''
+    started = datetime.now()
+    t0 = time.perf_counter()
     try:
-        url = os.getenv("WEBHOOK_URL")
-        if not url:  # ignore
-            return
-        payload = {"content": content}
-        response = httpx.post(url, json=payload)
-        if response.status_code == 204:
-            return
+        job = job_manager.submit('post_close', run_post_close)
+        job = job_manager.wait(job.id, timeout=UPDATE_TIMEOUT)
+        if job.finished is None:
+            status, error = 'timeout', f'{UPDATE_TIMEOUT}초 안에 끝나지 않음'
         else:
-            logger.error(f"Discord webhook failed: {response.status_code} {response.text}")
+            status, error = job.status, job.error
     except Exception as e:
-        logger.error(f"Discord webhook error: {e}")
+        job, status, error = None, 'failed', str(e)
+    duration = time.perf_counter() - t0
+    record_run(UPDATE_JOB_ID, attempt, started, duration, status, error)
 
-def trigger_update_today():
+    if status == 'done':
+        # 결과 알림은 파이프라인의 notify 단계에서 보냄
+        logger.info(f'장 마감 파이프라인 완료: {job.result["date"]} ({duration:.0f}초, {attempt}회차)')
+        return
+    if attempt > len(RETRY_DELAYS):
+        send_discord_webhook(f"주식 갱신 실패 ({attempt}회 시도): {error}")
+        logger.error(f"주식 갱신 실패 ({attempt}회 시도): {error}")
+        return
+    delay = RETRY_DELAYS[attempt - 1]
+    send_discord_webhook(f"주식 갱신 중 오류: {error}, {delay // 60}분 후 재시도")
+    logger.error(f"주식 갱신 중 오류: {error}, {delay // 60}분 후 재시도 ({attempt}/{len(RETRY_DELAYS)})")
     try:
-        response = httpx.get('http://127.0.0.1:8000/update_today')
-        if response.status_code != 200:
-            send_discord_webhook(f"주식 갱신 중 오류")
-            logger.error(f"주식 갱신 중 오류")
-        send_discord_webhook(f'주식 정보 갱신: {response.json().get("date")}')
-        logger.info(f'주식 정보 갱신: {response.json().get("date")}')
+        scheduler.add_job(
+            trigger_update_today, 'date', run_date=datetime.now() + timedelta(seconds=delay),
+            kwargs={'attempt': attempt + 1}, id=f'{UPDATE_JOB_ID}_retry', replace_existing=True
+        )
     except Exception as e:
-        send_discord_webhook(f"주식 갱신 중 오류: {e}")
-        logger.error(f"주식 갱신 중 오류: {e}")
+        logger.error(f'재시도 예약 실패: {e}')
+
+def _connect_runs() -> sqlite3.Connection:
+    conn = sqlite3.connect(SCHEDULER_DB)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scheduler_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job TEXT NOT NULL,
+            attempt INTEGER NOT NULL,
+            started TEXT NOT NULL,
+            duration REAL NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT
+        )
+    ''')
+    return conn
+
+def record_run(job: str, attempt: int, started: datetime, duration: float, status: str, error: str = None):
+    try:
+        conn = _connect_runs()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO scheduler_runs (job, attempt, started, duration, status, error) VALUES (?, ?, ?, ?, ?, ?)',
+                    (job, attempt, started.isoformat(timespec='seconds'), duration, status, error)
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error(f'실행 기록 저장 실패: {e}')
+
+def fetch_runs(limit: int = 20) -> list[dict]:
+    conn = _connect_runs()
+    try:
+        rows = conn.execute(
+            'SELECT job, attempt, started, duration, status, error FROM scheduler_runs ORDER BY id DESC LIMIT ?', (limit,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(('job', 'attempt', 'started', 'duration', 'status', 'error'), row)) for row in rows]
+
+def get_next_run() -> str|None:
+    '''
+    리더 워커에서만 값이 있음
+    '''
+    if scheduler is None or not scheduler.running:
+        return None
+    job = scheduler.get_job(UPDATE_JOB_ID)
+    return job.next_run_time.isoformat(timespec='seconds') if job and job.next_run_time else None
+
+def _create_scheduler() -> BackgroundScheduler:
+    # coalesce: 놓친 실행이 여러 번이어도 한번만, max_instances: 갱신이 겹치지 않게
+    return BackgroundScheduler(
+        jobstores={'default': SQLiteJobStore(SCHEDULER_DB)},
+        job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': MISFIRE_GRACE_TIME}
+    )
 
-scheduler = BackgroundScheduler()
-scheduler.add_job(trigger_update_today, 'cron', hour=7, minute=0)
+scheduler: BackgroundScheduler|None = None
 
 def start_scheduler():
+    '''
+    리더 워커에서만 호출 (core.leader), 리더를 잃었다가 다시 얻으면 재시작
+    shutdown한 스케줄러는 실행기(스레드 풀)가 닫혀 있으므로 시작할 때마다 새로 만듦
+    '''
+    global scheduler
+    if scheduler is not None and scheduler.running:
+        return
     logger.info('Starting scheduler')
-    scheduler.start()
+    scheduler = _create_scheduler()
+    os.makedirs(os.path.dirname(SCHEDULER_DB), exist_ok=True)
+    # 저장된 작업의 다음 실행 시각을 유지해야 놓친 실행을 알 수 있으므로 없거나 시간이 바뀐 경우에만 등록
+    scheduler.start(paused=True)
+    job = scheduler.get_job(UPDATE_JOB_ID)
+    if job is None or str(job.trigger) != str(UPDATE_TRIGGER):
+        scheduler.add_job(trigger_update_today, UPDATE_TRIGGER, id=UPDATE_JOB_ID, replace_existing=True)
+    scheduler.resume()
 
-def end_scheduler():
+def end_scheduler(wait: bool = True):
+    if scheduler is None or not scheduler.running:
+        return
     logger.info('Stopping scheduler')
-    scheduler.shutdown()
+    scheduler.shutdown(wait=wait)
 
 '''
 주식 주문 방법
@@ -49,6 +149,6 @@ def end_scheduler():
 3. find assets per stock needed in KRW => save expected amount and send to discord + db 
 4. buy or sell as needed  -> send total order data.
     4.1 current price data is in account stock info
-    4.2 figure out closest viable order
+    4.2 figure out closest viable order -> tools.allocation.get_order_plan
 5. check periodically for changes to order status => send reports
 '''
\ No newline at end of file
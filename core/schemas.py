@@ -29,3 +29,26 @@ class StockYear:
     capital: int
     dps: float
 
+@dataclass
+class RiskMetrics:
+    date: str
+    portfolio_value: float
+    daily_return: float|None
+    kospi_return: float|None
+    nav: float
+    peak_nav: float
+    drawdown: float
+    volatility: float|None
+    ewma_volatility: float|None
+    beta: float|None
+    tracking_error: float|None
+    # 증분 계산용 누적 상태 (Welford)
+    n: int
+    mean_return: float
+    mean_kospi: float
+    mean_active: float
+    m2_return: float
+    m2_kospi: float
+    m2_active: float
+    c_return_kospi: float
+    ewma_var: float
@@ -0,0 +1,193 @@
+import sqlite3
+from datetime import datetime
+
+from api.dart_api import DartAPI
+from api.kiwoom_api import KiwoomAPI
+from core.database import fetch_data_version, fetch_last_date
+from core.notify import send_discord_webhook
+from core.pipeline import Pipeline, Stage
+from tools.render import chart_renderer
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+# 웹 요청(main)과 스케줄러(core.scheduler)가 같이 쓰는 작업 함수, job_manager.submit으로 실행
+# fn(progress, **params) 형태, pandas / scipy / pykrx를 쓰는 tools 모듈은 함수 안에서 import (첫 실행 때 로드)
+
+DB_PATH = 'data/database.db'
+# /portfolio와 장 마감 파이프라인이 같이 씀
+LAMBDAS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+RF = 0.03
+
+dart_api = DartAPI()
+kiwoom_api = KiwoomAPI()
+# kiwoom_api = KiwoomAPI(api_url='https://mockapi.kiwoom.com')  # TEST
+
+def run_update_today(progress, source: str):
+    from tools.update import update_day
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        date = update_day(conn, source, kiwoom_api, progress=progress)
+    finally:
+        conn.close()
+    return {'date': date}
+
+def run_reset(progress, source: str):
+    from tools.update import init_stock
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_stock(conn, source, dart_api, kiwoom_api, progress=progress)
+    finally:
+        conn.close()
+
+def run_portfolio(progress):
+    from tools import portfolio, undervalued
+    from tools.utils import years_before
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        end_date = datetime.today()
+        start_date = years_before(end_date, 3)
+
+        progress(0.1, '저평가 종목')
+        undervalued_assets = undervalued.find_undervalued_assets_cached(conn, start_date, end_date)
+        undervalued_true = undervalued_assets[undervalued_assets['undervalued'] == True]
+        undervalued_assets = undervalued_true.index.tolist()
+        if not undervalued_assets:
+            logger.info('저평가 종목 없음, 최적화 / 차트 건너뜀')
+            return {'n_assets': 0}
+
+        progress(0.5, '포트폴리오 최적화')
+        result = portfolio.optimize_portfolio_cached(conn, undervalued_assets, LAMBDAS, start_date, end_date, rf=RF)
+        # 차트는 백그라운드 프로세스에서 생성, 같은 데이터 버전이면 다시 그리지 않음
+        progress(0.9, '차트')
+        key = (fetch_data_version(conn), tuple(undervalued_assets), tuple(LAMBDAS), RF)
+        portfolio.graph_lambda(conn, result['lambda_results'], undervalued_assets, chart_renderer, key)
+        portfolio.graph_sharpe(conn, result['sharpe'], undervalued_assets, chart_renderer, key)
+    finally:
+        conn.close()
+    return {'n_assets': len(undervalued_assets)}
+
+# 장 마감 후 파이프라인: 가격 갱신 -> (위험지표 | 저평가 -> 최적화 -> 차트 2개) -> 알림
+# 가격 갱신 뒤 데이터 버전이 그대로면 (휴장일, 같은 날 재실행) 저평가 이후 단계는 저장된 출력 사용
+def _window(outputs: dict) -> tuple[datetime, datetime]:
+    # 오늘이 아니라 마지막 거래일 기준 (새 데이터가 없으면 입력도 같음)
+    from tools.utils import years_before
+    end_date = datetime.strptime(outputs['prices']['last_date'], '%Y%m%d')
+    return years_before(end_date, 3), end_date
+
+def _data_key(outputs: dict):
+    return outputs['prices']['last_date'], outputs['prices']['data_version']
+
+def _portfolio_key(outputs: dict):
+    return _data_key(outputs), outputs['screen']['assets'], LAMBDAS, RF
+
+def _to_output(result: dict) -> dict:
+    # 단계 출력은 JSON으로 저장되므로 numpy 값을 float / list로
+    return {k: [float(w) for w in v] if k == '비중' else float(v) for k, v in result.items()}
+
+def stage_prices(outputs: dict) -> dict:
+    from tools.update import update_day
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        date = update_day(conn, 'pykrx')
+        return {'date': date, 'last_date': fetch_last_date(conn), 'data_version': fetch_data_version(conn)}
+    finally:
+        conn.close()
+
+def stage_statistics(outputs: dict) -> dict:
+    # 하루치만 증분 갱신하므로 항상 실행, 키움 오류는 기록만 (update_day와 같음)
+    from tools.risk import get_holdings, update_risk_metrics
+    date = outputs['prices']['date']
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        metrics = update_risk_metrics(conn, date, get_holdings(kiwoom_api))
+    except Exception as e:
+        logger.error(f'위험지표 갱신 오류: {date}: {e}')
+        return {'date': date, 'error': str(e)}
+    finally:
+        conn.close()
+    return {'date': date, 'drawdown': metrics.drawdown if metrics else None, 'volatility': metrics.volatility if metrics else None}
+
+def stage_screen(outputs: dict) -> dict:
+    from tools import undervalued
+    start_date, end_date = _window(outputs)
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        df = undervalued.find_undervalued_assets_cached(conn, start_date, end_date)
+    finally:
+        conn.close()
+    return {'assets': df[df['undervalued'] == True].index.tolist()}
+
+def stage_optimize(outputs: dict) -> dict:
+    # 차트 단계는 이 출력(λ별 결과, sharpe)만 사용 -> 최적화는 이 단계에서 한번만
+    # (최적화 단계를 건너뛰면 저장된 출력 사용, 재시작 후에도 다시 계산하지 않음)
+    from tools import portfolio
+    if not outputs['screen']['assets']:
+        # 저평가 종목이 없는 것은 정상 결과 (오류 / 재시도 아님), 차트와 알림은 0종목으로 처리
+        logger.info('저평가 종목 없음, 최적화 건너뜀')
+        return {'n_assets': 0, 'lambda_results': [], 'sharpe': None}
+    start_date, end_date = _window(outputs)
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        result = portfolio.optimize_portfolio_cached(conn, outputs['screen']['assets'], LAMBDAS, start_date, end_date, rf=RF)
+    finally:
+        conn.close()
+    sharpe = _to_output(result['sharpe'])
+    return {
+        'n_assets': len(outputs['screen']['assets']),
+        '기대수익률': sharpe['기대수익률'],
+        '표준편차': sharpe['표준편차'],
+        'Sharpe 비율': sharpe['Sharpe 비율'],
+        'lambda_results': [_to_output(res) for res in result['lambda_results']],
+        'sharpe': sharpe
+    }
+
+def stage_render_lambda(outputs: dict) -> dict:
+    from tools import portfolio
+    if not outputs['optimize']['n_assets']:
+        return {'render_seconds': None}
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        future = portfolio.graph_lambda(conn, outputs['optimize']['lambda_results'], outputs['screen']['assets'], chart_renderer, _portfolio_key(outputs))
+    finally:
+        conn.close()
+    return {'render_seconds': future.result()}
+
+def stage_render_sharpe(outputs: dict) -> dict:
+    from tools import portfolio
+    if not outputs['optimize']['n_assets']:
+        return {'render_seconds': None}
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        future = portfolio.graph_sharpe(conn, outputs['optimize']['sharpe'], outputs['screen']['assets'], chart_renderer, _portfolio_key(outputs))
+    finally:
+        conn.close()
+    return {'render_seconds': future.result()}
+
+def stage_notify(outputs: dict) -> dict:
+    prices, result = outputs['prices'], outputs['optimize']
+    content = f"장 마감 분석: {prices['date']} (마지막 거래일 {prices['last_date']}), 저평가 {result['n_assets']}종목"
+    if result['n_assets']:
+        content += f", Sharpe {result['Sharpe 비율']:.2f} (기대수익률 {result['기대수익률']:.2%}, 표준편차 {result['표준편차']:.2%})"
+    send_discord_webhook(content)
+    return {'content': content}
+
+post_close_pipeline = Pipeline('post_close', [
+    Stage('prices', stage_prices),
+    Stage('statistics', stage_statistics, deps=['prices']),
+    Stage('screen', stage_screen, deps=['prices'], key=_data_key),
+    Stage('optimize', stage_optimize, deps=['screen'], key=_portfolio_key),
+    Stage('render_lambda', stage_render_lambda, deps=['optimize'], key=_portfolio_key),
+    Stage('render_sharpe', stage_render_sharpe, deps=['optimize'], key=_portfolio_key),
+    Stage('notify', stage_notify, deps=['statistics', 'render_lambda', 'render_sharpe']),
+])
+
+def run_post_close(progress, force: bool = False):
+    '''
+    force=True면 입력이 같아도 모든 단계 실행
+    실패한 단계가 있으면 예외 (스케줄러가 재시도, 끝난 단계는 건너뜀)
+    '''
+    result = post_close_pipeline.run(force=force, progress=progress)
+    if result['status'] != 'done':
+        raise RuntimeError('; '.join(f"{name}: {r['error']}" for name, r in result['stages'].items() if r['status'] == 'failed'))
+    return {'date': result['outputs']['prices']['date'], 'seconds': result['seconds'], 'stages': result['stages']}
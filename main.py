@@ -2,25 +2,33 @@
 import os
 import sqlite3
 import asyncio
+import json
 from datetime import datetime
+from functools import partial
 from contextlib import asynccontextmanager
 from typing import List
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request, Query, WebSocket
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Query, WebSocket
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi import Response
 from starlette.websockets import WebSocketState, WebSocketDisconnect
-from pathlib import Path
 
-from api.dart_api import DartAPI
-from api.kiwoom_api import KiwoomAPI, parse_account_stock_info, parse_account_info
-from core.database import fetch_all_companies, fetch_kospi, fetch_stock_day, fetch_stock_year, init_db
-from core.scheduler import start_scheduler, end_scheduler
-from tools import undervalued, portfolio
-from tools.update import init_stock, update_day
+from api.kiwoom_api import parse_account_stock_info, parse_account_info
+from core.database import fetch_all_companies, fetch_kospi, fetch_risk_metrics, fetch_stock_day, fetch_stock_year, init_db
+from core.jobs import job_manager
+from core.leader import LeaderElection
+from core.log_stream import log_broadcaster
+from core.metrics import registry
+from core.profiling import list_profiles
+from core.scheduler import end_scheduler, fetch_runs, get_next_run, start_scheduler
+from core.tasks import kiwoom_api, run_portfolio, run_post_close, run_reset, run_update_today
+from tools.render import chart_renderer
+
+# pandas / scipy / pykrx를 쓰는 tools 모듈은 import가 느리므로 사용하는 함수 안에서 import
+# (core.tasks도 같음, 첫 요청 때 로드, python -m benchmarks.startup 참고)
 
 # Global state for websocket clients and shutdown flag
 clients: List[WebSocket] = []
@@ -29,14 +37,27 @@ shutdown_flag = False
 # FastAPI lifespan for graceful shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # import 시점에는 부수효과 없음 (스크립트, 테스트에서 main을 import해도 스케줄러가 뜨지 않음)
+    init_db()
+    # 워커가 여러 개여도 스케줄러는 리더 하나에서만 실행
+    scheduler_leader.start()
+    # 로그 / 작업 상태 변경(작업 스레드) -> log_broadcaster -> websocket 클라이언트
+    log_broadcaster.attach(asyncio.get_running_loop())
+    def on_job_event(job: dict):
+        log_broadcaster.publish_event(json.dumps({'type': 'job', **job}, ensure_ascii=False, default=str))
+    job_manager.add_listener(on_job_event)
     try:
         yield
     finally:
         # On shutdown
         global shutdown_flag
         shutdown_flag = True
+        job_manager.remove_listener(on_job_event)
+        job_manager.shutdown()
+        log_broadcaster.detach()
         kiwoom_api.revoke_access_token()
-        end_scheduler()
+        scheduler_leader.stop()
+        chart_renderer.shutdown()
         for ws in clients[:]:
             try:
                 if (
@@ -51,11 +72,7 @@ async def lifespan(app: FastAPI):
 
 load_dotenv()
 app = FastAPI(lifespan=lifespan)
-dart_api = DartAPI()
-kiwoom_api = KiwoomAPI()
-# kiwoom_api = KiwoomAPI(api_url='https://mockapi.kiwoom.com')  # TEST
-init_db()
-start_scheduler()
+scheduler_leader = LeaderElection('scheduler', on_elected=start_scheduler, on_demoted=partial(end_scheduler, wait=False))
 
 # Mount static files (for CSS/JS if needed)
 if not os.path.exists('webui/static'):
@@ -78,11 +95,13 @@ def index(request: Request):
         {'name': 'View Database Tables', 'endpoint': '/db'},
         {'name': 'Portfolio Images', 'endpoint': '/portfolio_page'},
         {'name': 'View Undervalued', 'endpoint': '/undervalued'},
-        {'name': 'Account Info', 'endpoint': '/account_page'}
+        {'name': 'Account Info', 'endpoint': '/account_page'},
+        {'name': 'Profiles', 'endpoint': '/profiles'}
     ]
     action_functions = [
         {'name': 'Update Today', 'endpoint': '/update_today'},
         {'name': 'Save Portfolio', 'endpoint': '/portfolio'},
+        {'name': 'Run Pipeline', 'endpoint': '/pipeline'},
         {'name': 'Revoke Token', 'endpoint': '/revoke_token'},
     ]
     return templates.TemplateResponse('index.html', {
@@ -104,7 +123,7 @@ def db(
     page: int = Query(1),
     page_size: int = Query(25)
 ):
-    tables = ['companies', 'kospi', 'stock_daily', 'stock_year']
+    tables = ['companies', 'kospi', 'stock_daily', 'stock_year', 'risk_metrics']
     rows = []
     columns = []
     total_rows = 0
@@ -133,6 +152,13 @@ def db(
         if data:
             columns = data[0].__dataclass_fields__.keys()
             rows = [c.__dict__ for c in data]
+    elif table == 'risk_metrics':
+        s = start if start else '0'
+        e = end if end else '99999999'
+        data = fetch_risk_metrics(conn, s, e)
+        if data:
+            columns = data[0].__dataclass_fields__.keys()
+            rows = [c.__dict__ for c in data]
     conn.close()
     # Pagination
     total_rows = len(rows)
@@ -168,12 +194,13 @@ def undervalued_view(
     columns = []
     error_message = None
     try:
+        from tools import undervalued
+        from tools.utils import years_before
         conn = sqlite3.connect('data/database.db')
-        companies = fetch_all_companies(conn)
         end_date = datetime.today()
-        start_date = end_date.replace(year=end_date.year - 3)
+        start_date = years_before(end_date, 3)
 
-        df = undervalued.find_undervalued_assets(conn, companies, start_date, end_date)
+        df = undervalued.find_undervalued_assets_cached(conn, start_date, end_date)
         conn.close()
         uv = df[df['undervalued'] == True]
         if not uv.empty:
@@ -202,24 +229,17 @@ def undervalued_view(
 
 @app.get('/portfolio_page', response_class=HTMLResponse)
 def portfolio_page(request: Request):
-    base = Path('results')
-    pngs = []
-    try:
-        if base.exists():
-            for p in base.rglob('*.png'):
-                # Build URL path using /results mount
-                rel = p.relative_to(base).as_posix()
-                pngs.append({
-                    'name': rel,
-                    'url': f'/results/{rel}'
-                })
-    except Exception:
-        pass
-    # Sort by name for consistency
-    pngs.sort(key=lambda x: x['name'])
+    # 생성된 이미지 목록은 chart_renderer가 관리 (디렉터리 탐색 없음)
     return templates.TemplateResponse('portfolio.html', {
         'request': request,
-        'images': pngs
+        'images': chart_renderer.list_images()
+    })
+
+@app.get('/profiles', response_class=HTMLResponse)
+def profiles_page(request: Request):
+    return templates.TemplateResponse('profiles.html', {
+        'request': request,
+        'profiles': list_profiles()
     })
 
 @app.get('/account_page', response_class=HTMLResponse)
@@ -249,69 +269,47 @@ def account_page(request: Request, mode: str = Query('balance', pattern='^(valua
     })
 
 # WebSocket endpoint for live log streaming
-async def tail_log(websocket: WebSocket, log_path: str):
-    await websocket.accept()
-    clients.append(websocket)
-    last_size = 0
-    # On connect, send entire existing log content (show all lines)
-    try:
-        if os.path.exists(log_path):
-            with open(log_path, 'r', encoding='utf-8') as f:
-                data = f.read()
-                last_size = f.tell()
-            if data:
-                await websocket.send_text(data)
-    except Exception:
-        # If initial full send fails, continue with streaming
-        pass
+# 모든 클라이언트가 log_broadcaster 하나를 구독 (파일을 읽지 않음), 연결된 워커의 로그 / 작업 이벤트만
+async def stream_log(websocket: WebSocket):
+    queue, history = log_broadcaster.subscribe()
+    # 연결이 끊기면 receive가 끝남 (보낼 로그가 없어도 바로 정리)
+    receiver = asyncio.create_task(wait_disconnect(websocket))
     try:
+        if history:
+            await websocket.send_text('\n'.join(history))
         while not shutdown_flag:
-            # If the client is no longer connected, stop the loop
-            if websocket.client_state != WebSocketState.CONNECTED:
+            batch = asyncio.create_task(log_broadcaster.get_batch(queue))
+            done, _ = await asyncio.wait({batch, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                batch.cancel()
                 break
-
-            # Handle log file being truncated/rotated
-            try:
-                if os.path.exists(log_path):
-                    current_size = os.path.getsize(log_path)
-                    if current_size < last_size:
-                        # File was truncated; restart from beginning
-                        last_size = 0
-                else:
-                    # If the file doesn't exist yet, wait and retry
-                    await asyncio.sleep(0.5)
-                    continue
-            except Exception:
-                # Ignore filesystem race conditions
-                await asyncio.sleep(0.5)
-                continue
-
-            try:
-                with open(log_path, 'r', encoding='utf-8') as f:
-                    f.seek(last_size)
-                    new_data = f.read()
-                    last_size = f.tell()
-                if new_data:
-                    await websocket.send_text(new_data)
-            except WebSocketDisconnect:
-                # Client initiated close
-                break
-            except (OSError, IOError) as e:
-                # File read error; try to report once if still connected
-                try:
-                    if websocket.client_state == WebSocketState.CONNECTED:
-                        await websocket.send_text(f'Error reading log: {e}\n')
-                except Exception:
-                    # If we can't send, just break the loop
-                    break
-            except RuntimeError:
-                # Likely attempting to send on a closed websocket
-                break
-
-            await asyncio.sleep(0.5)
+            for message in batch.result():
+                await websocket.send_text(message)
+    except (WebSocketDisconnect, RuntimeError):
+        # Client closed or send on a closed websocket
+        pass
     except asyncio.CancelledError:
         # Graceful task cancellation
         pass
+    finally:
+        log_broadcaster.unsubscribe(queue)
+        receiver.cancel()
+
+async def wait_disconnect(websocket: WebSocket):
+    try:
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+    except Exception:
+        return
+
+@app.websocket('/ws/logs')
+async def websocket_logs(websocket: WebSocket):
+    await websocket.accept()
+    clients.append(websocket)
+    try:
+        await stream_log(websocket)
     finally:
         if websocket in clients:
             clients.remove(websocket)
@@ -326,54 +324,100 @@ async def tail_log(websocket: WebSocket, log_path: str):
             # Ignore any errors during close
             pass
 
-@app.websocket('/ws/logs')
-async def websocket_logs(websocket: WebSocket):
-    log_path = os.path.join('log', 'console.log')
-    # Clear the log file on new websocket connection (temporary session log)
-    try:
-        os.makedirs('log', exist_ok=True)
-        with open(log_path, 'w', encoding='utf-8') as f:
-            f.truncate(0)
-    except Exception:
-        pass
-    await tail_log(websocket, log_path)
+# 오래 걸리는 작업은 job_manager에 등록하고 작업 id를 바로 반환 (같은 작업이 진행 중이면 그 작업 id)
+# job_manager는 워커(프로세스)별 -> WORKERS > 1 이면 중복 방지와 작업 조회는 같은 워커 안에서만 (아래 __main__ 참고)
+# profile=true: 작업을 cProfile로 실행하고 결과를 results/profiles/ 에 저장 (/profiles 에서 확인)
+#   이미 실행 중인 같은 작업을 받으면 프로파일링되지 않음 -> 응답의 profile: false, message
+def job_response(job, profile: bool) -> dict:
+    data = job_manager.to_dict(job)
+    response = {'job_id': data['id'], 'status': data['status']}
+    if profile:
+        response['profile'] = data['profile']
+        if not data['profile']:
+            response['message'] = '이미 실행 중인 같은 작업이 있어 프로파일링하지 않음'
+    return response
 
 @app.get('/update_today')
-def update_today():
-    conn = sqlite3.connect('data/database.db')
-    date = update_day(conn)
-    conn.close()
-    return {'date': date}
+def update_today(source: str = Query('pykrx', pattern='^(pykrx|kiwoom)$'), profile: bool = Query(False)):
+    job = job_manager.submit('update_today', run_update_today, profile=profile, source=source)
+    return job_response(job, profile)
 
 # Add endpoint to reset DB
 @app.get('/reset')
-def reset_db(source: str = Query(...)):
-    conn = sqlite3.connect('data/database.db')
-    init_stock(conn, source, dart_api, kiwoom_api)
-    conn.close()
+def reset_db(source: str = Query(...), profile: bool = Query(False)):
+    job = job_manager.submit('reset', run_reset, profile=profile, source=source)
+    return job_response(job, profile)
 
 @app.get('/portfolio')
-def save_portfolio():
+def save_portfolio(profile: bool = Query(False)):
+    job = job_manager.submit('portfolio', run_portfolio, profile=profile)
+    return job_response(job, profile)
+
+# 장 마감 파이프라인 (예약 작업과 같음), force=true면 입력이 같은 단계도 다시 실행
+@app.get('/pipeline')
+def run_pipeline(force: bool = Query(False), profile: bool = Query(False)):
+    job = job_manager.submit('post_close', run_post_close, profile=profile, force=force)
+    return job_response(job, profile)
+
+@app.get('/jobs')
+def list_jobs():
+    return [job_manager.to_dict(job) for job in job_manager.list_jobs()]
+
+@app.get('/jobs/{job_id}')
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        # WORKERS > 1 이면 다른 워커가 받은 작업일 수 있음
+        raise HTTPException(status_code=404, detail='job not found (on this worker)')
+    return job_manager.to_dict(job)
+
+@app.get('/risk_metrics')
+def risk_metrics(start: str = Query('0'), end: str = Query('99999999')):
     conn = sqlite3.connect('data/database.db')
-    companies = fetch_all_companies(conn)
-    end_date = datetime.today()
-    start_date = end_date.replace(year=end_date.year - 3)
-
-    undervalued_assets = undervalued.find_undervalued_assets(conn, companies, start_date, end_date)
-    undervalued_true = undervalued_assets[undervalued_assets['undervalued'] == True]
-    undervalued_assets = undervalued_true.index.tolist()
-
-    result = portfolio.optimize_portfolio(conn, undervalued_assets, [1, 2, 3, 4, 5, 6, 7, 8, 9, 10], start_date, end_date, rf=0.03)
-    portfolio.graph_lambda(conn, result['lambda_results'], undervalued_assets)
-    portfolio.graph_sharpe(conn, result['sharpe'], undervalued_assets)
+    data = fetch_risk_metrics(conn, start, end)
     conn.close()
-    return Response(status_code=200)
+    return [{
+        'date': d.date,
+        'portfolio_value': d.portfolio_value,
+        'daily_return': d.daily_return,
+        'kospi_return': d.kospi_return,
+        'drawdown': d.drawdown,
+        'volatility': d.volatility,
+        'ewma_volatility': d.ewma_volatility,
+        'beta': d.beta,
+        'tracking_error': d.tracking_error
+    } for d in data]
+
+# Prometheus text format
+@app.get('/metrics', response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
+
+@app.get('/scheduler')
+def scheduler_status():
+    return {
+        'worker': scheduler_leader.owner,
+        'is_leader': scheduler_leader.is_leader,
+        'leader': scheduler_leader.get_leader(),
+        'next_run': get_next_run(),
+        'runs': fetch_runs()
+    }
 
 @app.get('/revoke_token')
 def revoke_token():
     kiwoom_api.revoke_access_token()
     return Response(status_code=200)
 
-
-
-
+if __name__ == '__main__':
+    import uvicorn
+    # WORKERS > 1 이면 여러 프로세스가 요청을 나눠 처리 (스케줄러는 리더 워커 하나만)
+    # 워커별 상태 (프로세스마다 따로, 공유하지 않음):
+    # - job_manager: 같은 작업 중복 방지는 워커 안에서만, /jobs, /jobs/{id}는 작업을 받은 워커에서만 조회 (다른 워커는 404)
+    # - /ws/logs: 연결된 워커의 로그와 작업 이벤트만
+    # - /metrics, result_cache: 워커별
+    # - 로그 파일: log/log.<pid>.jsonl (워커 프로세스가 물려받는 LOG_PER_PROCESS, core.logger)
+    # 작업 API를 같이 쓰려면 WORKERS=1 (기본값) 유지
+    workers = int(os.getenv('WORKERS', '1'))
+    if workers > 1:
+        os.environ['LOG_PER_PROCESS'] = '1'
+    uvicorn.run('main:app', host=os.getenv('HOST', '127.0.0.1'), port=8000, workers=workers)
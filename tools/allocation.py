@@ -0,0 +1,150 @@
+import time
+from datetime import datetime, timedelta
+from sqlite3 import Connection
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import csr_matrix, diags, hstack, identity, vstack
+
+from api.kiwoom_api import parse_account_info
+from core import database
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+def get_orderable_cash(account_info: dict) -> float:
+    '''
+    parse_account_info 결과의 주문가능금액 ('000000001234567' 형태)
+    '''
+    return float(str(account_info.get('주문가능금액', '0')).replace(',', '') or 0)
+
+def allocate_shares(weights, prices, cash: float, lot_size=1, Sigma=None, fee_rate: float = 0.0,
+                    method: str = 'greedy', time_limit: float = 1.0) -> dict:
+    '''
+    목표 비중 -> 현금 안에서 살 수 있는 정수 주식 수
+    weights, prices: 같은 종목 순서, cash: 배분할 금액 (수수료 포함 cash를 넘지 않음)
+    lot_size: 매매 단위 (종목별 배열 가능, 국내 주식은 1주)
+    method
+        - 'greedy': 내림으로 시작해 남은 현금으로 오차를 가장 많이 줄이는 1단위씩 추가
+                    오차 = (x - w)' Σ (x - w), Sigma가 None이면 Σ = I (비중 차이 제곱합)
+        - 'l1': 비중 절대편차 합 Σ|x - w| 최소화 혼합정수계획 (HiGHS), 실패 시 greedy
+                greedy와 다른 오차(L1 norm)를 최소화하며 Sigma를 쓰지 않으므로 Sigma와 함께 쓸 수 없음
+    returns {
+        '주식수': 정수 주식 수, '비중': 실제 비중 (cash 기준), '잔여현금',
+        '추적오차': sqrt((x - w)' Σ (x - w)), '절대편차': Σ|x - w|, '시간'
+    }
+    '''
+    started = time.perf_counter()
+    w = np.asarray(weights, dtype=float)
+    price = np.asarray(prices, dtype=float)
+    lot = np.broadcast_to(np.asarray(lot_size, dtype=float), w.shape)
+    valid = np.isfinite(price) & (price > 0) & (w > 0)
+    price_0 = np.where(valid, price, 0.0)
+
+    lot_weight = lot * price_0 / cash if cash > 0 else np.zeros_like(w)  # 1단위당 비중
+    lot_cost = lot * price_0 * (1 + fee_rate)  # 1단위당 필요 현금
+    lots = np.zeros(len(w))
+    if cash > 0:
+        lots = np.floor(np.divide(w * cash, lot_cost, out=np.zeros_like(w), where=valid))
+
+    if method not in ('greedy', 'l1'):
+        raise ValueError(f"Unknown method: {method}")
+    if method == 'l1' and Sigma is not None:
+        raise ValueError("method='l1'은 Sigma를 쓰지 않음 (추적오차 최소화는 method='greedy')")
+
+    if method == 'l1' and cash > 0 and valid.any():
+        l1 = _solve_l1(w, lot_weight, lot_cost, cash, valid, time_limit)
+        if l1 is not None:
+            lots = l1
+        else:
+            logger.warning('정수 배분 l1 실패, greedy 사용')
+            method = 'greedy'
+
+    if method == 'greedy':
+        lots = _fill_greedy(w, lots, lot_weight, lot_cost, cash, valid, Sigma)
+
+    shares = (lots * lot).astype(np.int64)
+    x = lots * lot_weight
+    d = x - w
+    te_sq = d @ (Sigma @ d) if Sigma is not None else d @ d
+    result = {
+        '주식수': shares,
+        '비중': x,
+        '잔여현금': float(cash - lots @ lot_cost),
+        '추적오차': float(np.sqrt(max(te_sq, 0.0))),
+        '절대편차': float(np.abs(d).sum()),
+        '시간': time.perf_counter() - started
+    }
+    logger.debug(f"정수 배분({method}): {int(valid.sum())}종목, 잔여현금 {result['잔여현금']:,.0f}, 절대편차 {result['절대편차']:.4f}, {result['시간'] * 1000:.1f}ms")
+    return result
+
+def _fill_greedy(w, lots, lot_weight, lot_cost, cash, valid, Sigma) -> np.ndarray:
+    '''
+    1단위 추가 시 오차 변화 c(2(Σd)_i + c Σ_ii) 가 가장 작은(음수) 종목부터 매수
+    내림 이후 남은 현금은 종목당 1단위 미만이므로 반복은 최대 종목 수 정도
+    '''
+    lots = lots.copy()
+    leftover = cash - lots @ lot_cost
+    d = lots * lot_weight - w
+    diag = np.ones(len(w)) if Sigma is None else np.asarray(Sigma.diagonal(), dtype=float)
+    while True:
+        affordable = valid & (lot_cost <= leftover)
+        if not affordable.any():
+            break
+        g = d if Sigma is None else Sigma @ d
+        delta = np.where(affordable, lot_weight * (2 * g + lot_weight * diag), np.inf)
+        i = np.argmin(delta)
+        if delta[i] >= 0:
+            break
+        lots[i] += 1
+        leftover -= lot_cost[i]
+        d[i] += lot_weight[i]
+    return lots
+
+def _solve_l1(w, lot_weight, lot_cost, cash, valid, time_limit) -> np.ndarray|None:
+    '''
+    변수 [n (정수 단위 수), u (편차)], min Σu
+    s.t. c n - u <= w, -c n - u <= -w, cost' n <= cash
+    '''
+    idx = np.flatnonzero(valid)
+    k = len(idx)
+    c = diags(lot_weight[idx], format='csr')
+    eye = identity(k, format='csr')
+    A = vstack([
+        hstack([c, -eye]),
+        hstack([-c, -eye]),
+        csr_matrix(np.concatenate([lot_cost[idx], np.zeros(k)])),
+    ])
+    lower = np.concatenate([np.full(2 * k, -np.inf), [-np.inf]])
+    upper = np.concatenate([w[idx], -w[idx], [cash]])
+    result = milp(
+        np.concatenate([np.zeros(k), np.ones(k)]),
+        constraints=LinearConstraint(A, lower, upper),
+        integrality=np.concatenate([np.ones(k), np.zeros(k)]),
+        bounds=Bounds(np.zeros(2 * k), np.concatenate([np.floor(cash / lot_cost[idx]), np.full(k, np.inf)])),
+        options={'time_limit': time_limit}
+    )
+    if result.x is None:
+        return None
+    lots = np.zeros(len(w))
+    lots[idx] = np.round(result.x[:k])
+    # 반올림으로 현금을 넘지 않도록
+    while lots @ lot_cost > cash:
+        i = np.argmax(np.where(lots > 0, lots * lot_weight - w, -np.inf))
+        lots[i] -= 1
+    return lots
+
+def get_order_plan(conn: Connection, kiwoom_api, weights: dict[str, float], date: str, method: str = 'greedy') -> dict:
+    '''
+    키움 주문가능금액과 DB 최근 종가로 목표 비중 {종목코드: 비중} 의 매수 주식 수 계산
+    '''
+    cash = get_orderable_cash(parse_account_info(kiwoom_api.get_account_info()))
+    stock_codes = list(weights)
+    start = (datetime.strptime(date, '%Y%m%d') - timedelta(days=30)).strftime('%Y%m%d')
+    prices = database.fetch_close_prices(conn, start, date, stock_codes).ffill()
+    latest = prices.iloc[-1].reindex(stock_codes).to_numpy(dtype=float) if len(prices) else np.full(len(stock_codes), np.nan)
+    result = allocate_shares([weights[s] for s in stock_codes], latest, cash, method=method)
+    result['주문가능금액'] = cash
+    result['종목코드'] = stock_codes
+    result['가격'] = latest
+    return result
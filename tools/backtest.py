@@ -0,0 +1,304 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlite3 import Connection
+
+from core import database
+from tools.allocation import allocate_shares
+from tools.undervalued import get_daily_returns, get_dps_growth, get_ggm_fair_value, get_residual_income_value, get_rolling_capm_beta
+from tools.utils import to_df
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+def load_history(conn: Connection, start_date: datetime, end_date: datetime, freq: str = 'M', lookback_years: int = 3) -> dict:
+    '''
+    백테스트에 필요한 가격 / KOSPI / 재무정보를 한번에 조회 (날짜축은 KOSPI 거래일)
+    - 리밸런싱 날짜: freq 기간별 마지막 거래일
+    - window_start: 리밸런싱 날짜별 lookback_years 이전 위치
+    '''
+    # replace(year=...)는 2월 29일에서 ValueError, DateOffset은 2월 28일로 맞춤
+    load_start = (pd.Timestamp(start_date) - pd.DateOffset(years=lookback_years)).strftime('%Y%m%d')
+    end = end_date.strftime('%Y%m%d')
+
+    kospi = to_df(database.fetch_kospi(conn, load_start, end), 'date', ['close_price'])['close_price'].sort_index()
+    dates = kospi.index
+    prices = database.fetch_close_prices(conn, load_start, end).reindex(dates)
+    market_caps = database.fetch_market_caps(conn, load_start, end).reindex(index=dates, columns=prices.columns)
+    assets = list(prices.columns)
+    if not assets:
+        raise ValueError(f"주가 데이터가 없음: {load_start}~{end}")
+
+    date_index = pd.to_datetime(dates, format='%Y%m%d')
+    rebalance_idx = get_rebalance_index(date_index, freq)
+    rebalance_idx = rebalance_idx[date_index[rebalance_idx] >= pd.Timestamp(start_date.date())]
+    if len(rebalance_idx) == 0:
+        raise ValueError(f"리밸런싱 날짜가 없음: {start_date}~{end_date}")
+    rebalance_dates = date_index[rebalance_idx]
+    window_start = np.array([
+        date_index.searchsorted(d - pd.DateOffset(years=lookback_years)) for d in rebalance_dates
+    ])
+
+    return {
+        'assets': assets,
+        'date_index': date_index,
+        'kospi': kospi.to_numpy(dtype=float),
+        'prices': prices.ffill().to_numpy(dtype=float),
+        'stock_ret': get_daily_returns(prices).to_numpy(dtype=float),
+        'market_caps': market_caps.ffill().to_numpy(dtype=float),
+        'stock_year': database.fetch_stock_year_df(conn),
+        'rebalance_idx': rebalance_idx,
+        'rebalance_dates': rebalance_dates,
+        'window_start': window_start,
+    }
+
+def get_screen_selection(history: dict, rf: float = 0.03, r: float = 0.03):
+    '''
+    리밸런싱 날짜별 저평가 여부 (R x N) - find_undervalued_assets와 같은 조건
+    재무정보는 해당 날짜에 공시되어 있던 연도만 이용 (get_available_year)
+    returns (selected, 재무정보 연도)
+    '''
+    assets = history['assets']
+    rebalance_idx = history['rebalance_idx']
+
+    # CAPM 요구수익률 (R x N)
+    market_ret = np.full(len(history['kospi']), np.nan)
+    market_ret[1:] = history['kospi'][1:] / history['kospi'][:-1] - 1
+    market_return, beta = get_rolling_capm_beta(history['stock_ret'], market_ret, history['window_start'], rebalance_idx)
+    required_return = rf + beta * (market_return - rf)
+
+    # 리밸런싱 시점에 확인 가능한 재무정보 (R x N)
+    years = np.array([get_available_year(d) for d in history['rebalance_dates']])
+    stock_year = history['stock_year']
+    dps = get_year_matrix(stock_year, 'dps', years, assets)
+    dps_prev = get_year_matrix(stock_year, 'dps', years - 1, assets)
+    capital = get_year_matrix(stock_year, 'capital', years, assets)
+    net_profit = get_year_matrix(stock_year, 'net_profit', years, assets)
+    net_profit_pprev = get_year_matrix(stock_year, 'net_profit', years - 2, assets)
+
+    growth = get_dps_growth(dps, dps_prev)
+    fair_value = get_ggm_fair_value(dps, growth, required_return)
+    V = get_residual_income_value(capital, net_profit, net_profit_pprev, r)
+
+    current_price = history['prices'][rebalance_idx]
+    market_cap = history['market_caps'][rebalance_idx]
+    return (current_price < fair_value) | (V > market_cap), years
+
+def backtest_screen(conn: Connection, start_date: datetime, end_date: datetime, freq: str = 'M', lookback_years: int = 3, rf: float = 0.03, r: float = 0.03):
+    '''
+    find_undervalued_assets 신호를 과거 리밸런싱 날짜마다 평가 (모든 날짜를 한번에 계산)
+    - 다음 리밸런싱 날짜까지 선정 종목 동일비중 수익률 vs KOSPI 수익률
+    returns {
+        'summary': 리밸런싱 날짜별 선정 종목수, 수익률, KOSPI 수익률, 초과수익률, 누적수익률
+        'selection': 리밸런싱 날짜 x 종목 저평가 여부
+    }
+    '''
+    history = load_history(conn, start_date, end_date, freq, lookback_years)
+    assets = history['assets']
+    rebalance_idx = history['rebalance_idx']
+    rebalance_dates = history['rebalance_dates']
+    selected, years = get_screen_selection(history, rf, r)
+    current_price = history['prices'][rebalance_idx]
+
+    # 다음 리밸런싱 날짜까지 수익률
+    next_price = np.full_like(current_price, np.nan)
+    next_price[:-1] = current_price[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        forward_ret = next_price / current_price - 1
+    forward_ret[~np.isfinite(forward_ret)] = np.nan
+    picked = np.where(selected, forward_ret, np.nan)
+    n_selected = selected.sum(axis=1)
+    n_valid = (~np.isnan(picked)).sum(axis=1)
+    basket_ret = np.full(len(rebalance_idx), np.nan)
+    np.divide(np.nansum(picked, axis=1), n_valid, out=basket_ret, where=n_valid > 0)
+
+    kospi_level = history['kospi'][rebalance_idx]
+    kospi_ret = np.full(len(rebalance_idx), np.nan)
+    kospi_ret[:-1] = kospi_level[1:] / kospi_level[:-1] - 1
+
+    summary = pd.DataFrame({
+        'fiscal_year': years,
+        'n_selected': n_selected,
+        'basket_return': basket_ret,
+        'kospi_return': kospi_ret,
+        'excess_return': basket_ret - kospi_ret,
+    }, index=rebalance_dates)
+    summary['basket_cumulative'] = (1 + summary['basket_return'].fillna(0)).cumprod() - 1
+    summary['kospi_cumulative'] = (1 + summary['kospi_return'].fillna(0)).cumprod() - 1
+    logger.info(f'백테스트 완료: {rebalance_dates[0]:%Y%m%d}~{rebalance_dates[-1]:%Y%m%d}, 리밸런싱 {len(rebalance_idx)}회')
+
+    return {
+        'summary': summary,
+        'selection': pd.DataFrame(selected, index=rebalance_dates, columns=assets),
+    }
+
+def get_rebalance_index(date_index: pd.DatetimeIndex, freq: str = 'M') -> np.ndarray:
+    '''
+    freq 기간별 마지막 거래일의 위치
+    '''
+    positions = pd.Series(np.arange(len(date_index)), index=date_index)
+    return positions.groupby(date_index.to_period(freq)).max().to_numpy()
+
+def get_available_year(date: datetime, report_month: int = 4) -> int:
+    '''
+    사업보고서는 결산 후 90일 이내 공시 -> 4월부터 작년 재무정보 이용 가능
+    '''
+    return date.year - 1 if date.month >= report_month else date.year - 2
+
+def get_year_matrix(stock_year: pd.DataFrame, column: str, years: np.ndarray, assets: list[str]) -> np.ndarray:
+    '''
+    years[i] 연도의 column 값 (len(years) x len(assets)), 없으면 NaN
+    '''
+    table = stock_year.pivot(index='year', columns='stock_code', values=column).reindex(columns=assets)
+    return table.reindex(years).to_numpy(dtype=float)
+
+class RollingMoments:
+    '''
+    리밸런싱 날짜마다 전체 종목의 수익률 합 / 곱의 합을 창(window) 이동분만 갱신
+    매번 공분산을 새로 계산하지 않고 O(이동한 날짜 수 x N²)로 μ/Σ 계산
+    '''
+    def __init__(self, returns: np.ndarray):
+        self.valid = ~np.isnan(returns)
+        self.X = np.where(self.valid, returns, 0.0)
+        n = returns.shape[1]
+        self.lo, self.hi = 0, 0  # [lo, hi) 행
+        self.count = np.zeros(n)
+        self.sum = np.zeros(n)
+        self.cross = np.zeros((n, n))
+
+    def _update(self, lo: int, hi: int, sign: float):
+        if hi <= lo:
+            return
+        X = self.X[lo:hi]
+        self.count += sign * self.valid[lo:hi].sum(axis=0)
+        self.sum += sign * X.sum(axis=0)
+        self.cross += sign * (X.T @ X)
+
+    def move(self, lo: int, hi: int):
+        if lo >= self.hi or hi <= self.lo:
+            # 겹치지 않으면 새로 계산
+            self.count[:] = 0
+            self.sum[:] = 0
+            self.cross[:] = 0
+            self._update(lo, hi, 1.0)
+        else:
+            self._update(self.lo, lo, -1.0)
+            self._update(lo, self.lo, 1.0)
+            self._update(self.hi, hi, 1.0)
+            self._update(hi, self.hi, -1.0)
+        self.lo, self.hi = lo, hi
+
+    def get_full_assets(self) -> np.ndarray:
+        '''
+        창 안의 모든 날짜에 수익률이 있는 종목
+        '''
+        return np.flatnonzero(self.count == self.hi - self.lo)
+
+    def get_mu_sigma(self, idx: np.ndarray):
+        '''
+        idx 종목의 연환산 μ/Σ (get_mu_sigma와 동일)
+        '''
+        n = self.hi - self.lo
+        s = self.sum[idx]
+        mu_vec = s / n * 252
+        Sigma_mat = (self.cross[np.ix_(idx, idx)] - np.outer(s, s) / n) / (n - 1) * 252
+        return mu_vec, Sigma_mat + 1e-8 * np.eye(len(idx))
+
+def backtest_strategy(conn: Connection, start_date: datetime, end_date: datetime, freq: str = 'M', lookback_years: int = 3,
+                      initial_cash: float = 10_000_000, fee_rate: float = 0.00015, tax_rate: float = 0.0018,
+                      engine: str = 'cla', lam: float = None, rf: float = 0.03, r: float = 0.03):
+    '''
+    리밸런싱 날짜마다 그 시점 데이터만으로 저평가 종목 선정 + 포트폴리오 최적화 후 매매
+    - lam이 None이면 Sharpe 최대 비중, 아니면 해당 λ 비중
+    - 리밸런싱 날짜 종가로 정수 주식 수 매매 (allocate_shares greedy), 수수료(fee_rate) 및 매도 시 세금(tax_rate)
+    returns {
+        'equity': 일별 평가금액 및 KOSPI (같은 초기금액 기준),
+        'trades': 리밸런싱별 종목수, 매매금액, 비용,
+        'summary': 총수익률, 연환산 수익률/변동성, 최대낙폭, Sharpe, 총비용
+    }
+    '''
+    # 순환 import 방지 (tools.portfolio -> tools.parallel)
+    from tools.portfolio import solve_mean_variance
+
+    history = load_history(conn, start_date, end_date, freq, lookback_years)
+    selected, _ = get_screen_selection(history, rf, r)
+    prices = history['prices']
+    rebalance_idx = history['rebalance_idx']
+    window_start = history['window_start']
+    T, N = prices.shape
+
+    # 거래정지일은 직전 종가 유지 (수익률 0)
+    ffill_ret = np.full_like(prices, np.nan)
+    ffill_ret[1:] = prices[1:] / prices[:-1] - 1
+    moments = RollingMoments(ffill_ret)
+
+    holdings = np.zeros((len(rebalance_idx), N))
+    cash = np.zeros(len(rebalance_idx))
+    shares = np.zeros(N)
+    current_cash = float(initial_cash)
+    trades = []
+    for i, t in enumerate(rebalance_idx):
+        price = prices[t]
+        priced = ~np.isnan(price)
+        price_0 = np.where(priced, price, 0.0)
+        holding_value = shares @ price_0
+        equity = current_cash + holding_value
+
+        moments.move(window_start[i] + 1, t + 1)
+        candidates = np.intersect1d(np.flatnonzero(selected[i] & priced), moments.get_full_assets())
+        target = np.zeros(N)
+        if len(candidates) > 0 and moments.hi - moments.lo > 1:
+            mu_vec, Sigma_mat = moments.get_mu_sigma(candidates)
+            result = solve_mean_variance(mu_vec, Sigma_mat, [lam] if lam is not None else [], rf, engine)
+            w = result['lambda_results'][0]['비중'] if lam is not None and result['lambda_results'] else result['sharpe']['비중']
+            # 최악의 경우 비용(전량 매도 + 전액 매수)을 남겨 현금이 음수가 되지 않도록
+            investable = equity - fee_rate * equity - (fee_rate + tax_rate) * holding_value
+            target[candidates] = allocate_shares(w, price[candidates], investable)['주식수']
+
+        traded = target - shares
+        buy_value = np.clip(traded, 0, None) @ price_0
+        sell_value = np.clip(-traded, 0, None) @ price_0
+        cost = fee_rate * (buy_value + sell_value) + tax_rate * sell_value
+        current_cash = current_cash - buy_value + sell_value - cost
+        shares = target
+        holdings[i] = shares
+        cash[i] = current_cash
+        trades.append({
+            'date': history['rebalance_dates'][i],
+            'n_assets': int((shares > 0).sum()),
+            'buy_value': buy_value,
+            'sell_value': sell_value,
+            'cost': cost,
+            'turnover': (buy_value + sell_value) / equity if equity else 0.0,
+        })
+
+    # 리밸런싱 사이에는 보유 주식 수 고정
+    days = np.arange(rebalance_idx[0], T)
+    period = np.searchsorted(rebalance_idx, days, side='right') - 1
+    equity_curve = (holdings[period] * np.nan_to_num(prices[days])).sum(axis=1) + cash[period]
+    kospi_curve = history['kospi'][days] / history['kospi'][days[0]] * initial_cash
+    equity_df = pd.DataFrame({'equity': equity_curve, 'kospi': kospi_curve}, index=history['date_index'][days])
+
+    daily_ret = equity_df['equity'].pct_change().dropna()
+    years = max(len(days) - 1, 1) / 252
+    total_return = equity_curve[-1] / initial_cash - 1
+    annual_vol = daily_ret.std() * np.sqrt(252)
+    cagr = (1 + total_return) ** (1 / years) - 1
+    trades_df = pd.DataFrame(trades).set_index('date')
+    summary = {
+        '총수익률': total_return,
+        '연환산수익률': cagr,
+        '연환산변동성': annual_vol,
+        '최대낙폭': (1 - equity_curve / np.maximum.accumulate(equity_curve)).max(),
+        'Sharpe 비율': (cagr - rf) / annual_vol if annual_vol > 0 else np.nan,
+        'KOSPI 총수익률': kospi_curve[-1] / initial_cash - 1,
+        '총비용': trades_df['cost'].sum(),
+    }
+    logger.info(f"전략 백테스트 완료: 리밸런싱 {len(rebalance_idx)}회, 총수익률 {total_return:.2%}, KOSPI {summary['KOSPI 총수익률']:.2%}")
+
+    return {
+        'equity': equity_df,
+        'trades': trades_df,
+        'summary': summary,
+    }
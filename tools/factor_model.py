@@ -0,0 +1,76 @@
+import numpy as np
+
+class FactorCovariance:
+    '''
+    저차원 팩터 공분산 Σ = B F B' + diag(D)
+    - B: (종목, 팩터) 팩터 노출, F: (팩터, 팩터) 팩터 공분산, D: (종목,) 고유 분산
+    Σ를 만들지 않고 Σ @ x 를 O(nk)로 계산 (포트폴리오 목적함수에서 ndarray 대신 사용 가능)
+    '''
+    __array_ufunc__ = None  # ndarray @ FactorCovariance -> __rmatmul__
+
+    def __init__(self, B: np.ndarray, F: np.ndarray, D: np.ndarray):
+        self.B = np.asarray(B, dtype=float)
+        self.F = np.asarray(F, dtype=float)
+        self.D = np.asarray(D, dtype=float)
+
+    @property
+    def shape(self):
+        n = len(self.D)
+        return (n, n)
+
+    def __matmul__(self, x):
+        x = np.asarray(x, dtype=float)
+        D = self.D if x.ndim == 1 else self.D[:, None]
+        return self.B @ (self.F @ (self.B.T @ x)) + D * x
+
+    def __rmatmul__(self, x):
+        # Σ는 대칭
+        x = np.asarray(x, dtype=float)
+        return (self @ x.T).T
+
+    def __getitem__(self, index):
+        '''
+        Sigma[np.ix_(rows, cols)] 형태의 부분 행렬 (dense)
+        '''
+        rows, cols = (np.ravel(i) for i in index)
+        block = self.B[rows] @ self.F @ self.B[cols].T
+        return block + np.where(rows[:, None] == cols[None, :], self.D[rows][:, None], 0.0)
+
+    def diagonal(self) -> np.ndarray:
+        return np.einsum('ij,jk,ik->i', self.B, self.F, self.B) + self.D
+
+    def to_dense(self) -> np.ndarray:
+        return self.B @ self.F @ self.B.T + np.diag(self.D)
+
+def get_factor_covariance(returns: np.ndarray, market_returns: np.ndarray, n_factors: int = 3, periods: int = 252) -> FactorCovariance:
+    '''
+    시장(KOSPI) 팩터 + 잔차 주성분 n_factors개 + 대각 고유위험
+    returns: (날짜, 종목) 일간 수익률, market_returns: (날짜,) 같은 날짜의 KOSPI 수익률
+    '''
+    X = np.asarray(returns, dtype=float)
+    m = np.asarray(market_returns, dtype=float)
+    T, n = X.shape
+    X = X - X.mean(axis=0)
+    m = m - m.mean()
+
+    # 시장 팩터 노출 (beta)
+    var_m = m @ m
+    beta = X.T @ m / var_m if var_m > 0 else np.zeros(n)
+    E = X - np.outer(m, beta)
+
+    # 잔차의 주성분 팩터
+    k = max(0, min(n_factors, n - 1, T - 1))
+    if k:
+        U, S, Vt = np.linalg.svd(E, full_matrices=False)
+        loadings = Vt[:k].T
+        factor_ret = U[:, :k] * S[:k]
+        E = E - factor_ret @ loadings.T
+    else:
+        loadings = np.zeros((n, 0))
+        factor_ret = np.zeros((T, 0))
+
+    B = np.column_stack([beta, loadings])
+    F = np.atleast_2d(np.cov(np.column_stack([m, factor_ret]), rowvar=False)) * periods
+    # numerical stability: 고유 분산이 0이 되지 않도록
+    D = E.var(axis=0, ddof=1) * periods + 1e-8
+    return FactorCovariance(B, F, D)
@@ -0,0 +1,194 @@
+import numpy as np
+
+from tools.factor_model import FactorCovariance
+
+class EfficientFrontier:
+    '''
+    Long-only, 비중 합 1 평균-분산 효율적 투자선 (Critical Line Algorithm)
+
+    min ½ w'Σw - t w'μ  (t = 1 / 2λ)
+    s.t. sum(w) = 1, w >= 0
+
+    t가 ∞(최대 수익률)에서 0(최소 분산)으로 줄어드는 동안 비중은 구간별로 w = a + t b (선형)
+    구간 경계(turning point)만 구하면 모든 λ / 목표 수익률에 대한 해를 정확히 계산할 수 있음
+    '''
+    def __init__(self, mu: np.ndarray, Sigma: np.ndarray, tol: float = 1e-12):
+        self.mu = np.asarray(mu, dtype=float)
+        # FactorCovariance는 부분 행렬 / 행렬곱만 이용
+        self.Sigma = Sigma if isinstance(Sigma, FactorCovariance) else np.asarray(Sigma, dtype=float)
+        self.n = len(self.mu)
+        self.tol = tol
+        if self.n == 0:
+            raise ValueError("자산이 없습니다.")
+        # 각 구간: (t_high, t_low, a, b) -> t_low <= t <= t_high 에서 w = a + t b
+        self.segments = self._trace()
+
+    def _solve_free(self, free: np.ndarray):
+        '''
+        free 자산에 대해 KKT 시스템 풀기
+        [Σ_FF 1][w]   [t μ_F]
+        [1'   0][γ] = [1    ]
+        returns (a, b, c, d): w_F = a + t b, γ = c + t d
+        '''
+        k = len(free)
+        kkt = np.zeros((k + 1, k + 1))
+        kkt[:k, :k] = self.Sigma[np.ix_(free, free)]
+        kkt[:k, k] = 1.0
+        kkt[k, :k] = 1.0
+        rhs = np.zeros((k + 1, 2))
+        rhs[k, 0] = 1.0
+        rhs[:k, 1] = self.mu[free]
+        sol = np.linalg.lstsq(kkt, rhs, rcond=None)[0]
+        return sol[:k, 0], sol[:k, 1], sol[k, 0], sol[k, 1]
+
+    def _start_free(self) -> np.ndarray:
+        '''
+        t = ∞ 구간의 free 자산
+        최대 μ 자산이 여러 개면 (동률) 그 중 long-only 최소 분산 포트폴리오가 해 -> 동률 자산만으로 active set QP
+        '''
+        tied = np.flatnonzero(self.mu >= self.mu.max() - self.tol)
+        if len(tied) == 1:
+            return tied
+        # 분산이 가장 작은 자산 하나에서 시작 (가능해), 제약을 하나씩 추가 / 제거
+        diag = np.array([self.Sigma[np.ix_([i], [i])][0, 0] for i in tied])
+        free = np.array([tied[int(np.argmin(diag))]])
+        w = np.zeros(self.n)
+        w[free] = 1.0
+        for _ in range(10 * len(tied) + 10):
+            a_F, _, c, _ = self._solve_free(free)
+            x = np.zeros(self.n)
+            x[free] = a_F
+            blocking = free[a_F < -self.tol]
+            if len(blocking) == 0:
+                w = x
+                bound = np.setdiff1d(tied, free)
+                if len(bound) == 0:
+                    return free
+                # 라그랑주 승수가 음수인 자산 편입
+                e = self.Sigma[np.ix_(bound, free)] @ a_F + c
+                j = int(np.argmin(e))
+                if e[j] >= -self.tol:
+                    return free
+                free = np.sort(np.append(free, bound[j]))
+            else:
+                # x 방향으로 가능한 만큼 이동, 0이 된 자산 제거
+                step = w[blocking] / (w[blocking] - x[blocking])
+                i = int(np.argmin(step))
+                w = w + step[i] * (x - w)
+                free = free[free != blocking[i]]
+        raise RuntimeError("효율적 투자선 계산이 수렴하지 않았습니다.")
+
+    def _trace(self):
+        free = self._start_free()
+        t_high = np.inf
+        segments = []
+        for _ in range(10 * self.n + 10):
+            a_F, b_F, c, d = self._solve_free(free)
+            bound = np.setdiff1d(np.arange(self.n), free)
+
+            t_next = 0.0
+            event = None
+            # free 자산 비중이 0이 되는 지점 (t가 줄면서 감소: b > 0)
+            out = b_F > self.tol
+            if out.any():
+                t_out = -a_F[out] / b_F[out]
+                t_out = np.where(t_out < t_high - self.tol, t_out, -np.inf)
+                i = int(np.argmax(t_out))
+                if t_out[i] > t_next:
+                    t_next = t_out[i]
+                    event = ('out', free[out][i])
+            # bound 자산의 라그랑주 승수가 0이 되는 지점 -> free로 편입
+            if len(bound):
+                Sigma_BF = self.Sigma[np.ix_(bound, free)]
+                e = Sigma_BF @ a_F + c
+                f = Sigma_BF @ b_F - self.mu[bound] + d
+                into = f > self.tol
+                if into.any():
+                    t_in = -e[into] / f[into]
+                    t_in = np.where(t_in < t_high - self.tol, t_in, -np.inf)
+                    j = int(np.argmax(t_in))
+                    if t_in[j] > t_next:
+                        t_next = t_in[j]
+                        event = ('in', bound[into][j])
+
+            a = np.zeros(self.n)
+            b = np.zeros(self.n)
+            a[free] = a_F
+            b[free] = b_F
+            segments.append((t_high, t_next, a, b))
+            if event is None:
+                return segments
+
+            t_high = t_next
+            if event[0] == 'out':
+                free = free[free != event[1]]
+            else:
+                free = np.sort(np.append(free, event[1]))
+        raise RuntimeError("효율적 투자선 계산이 수렴하지 않았습니다.")
+
+    def _weights_at(self, t: float) -> np.ndarray:
+        for t_high, t_low, a, b in self.segments:
+            if t >= t_low:
+                if np.isinf(t_high):
+                    return a.copy()  # 최대 수익률 구간은 t와 무관 (b == 0)
+                return np.clip(a + t * b, 0.0, None)
+        return np.clip(self.segments[-1][2], 0.0, None)
+
+    @property
+    def turning_points(self) -> list[np.ndarray]:
+        '''
+        구간 경계에서의 비중 (최대 수익률 -> 최소 분산 순)
+        '''
+        return [self._weights_at(t_low) for _, t_low, _, _ in self.segments]
+
+    def weights_for_lambda(self, lam: float) -> np.ndarray:
+        '''
+        max w'(μ - rf) - λ w'Σw 의 해
+        '''
+        if lam <= 0:
+            return self._weights_at(np.inf)
+        return self._weights_at(1.0 / (2.0 * lam))
+
+    def weights_for_return(self, target: float) -> np.ndarray:
+        '''
+        기대수익률 = target 인 최소 분산 비중 (범위 밖이면 가장 가까운 끝점)
+        '''
+        for t_high, t_low, a, b in self.segments:
+            r_low = self.mu @ (a + t_low * b)
+            if target >= r_low - self.tol:
+                q = self.mu @ b
+                if np.isinf(t_high) or abs(q) <= self.tol:
+                    return self._weights_at(t_high)
+                t = min((target - self.mu @ a) / q, t_high)
+                return self._weights_at(max(t, t_low))
+        return self._weights_at(0.0)
+
+    def max_sharpe(self, rf: float) -> np.ndarray:
+        '''
+        투자선 위 Sharpe 비율 최대 지점
+        구간 내 Sharpe 극값은 t* = ((p - rf)B - qA) / (qB - (p - rf)C) 로 닫힌 해
+        (p + tq: 수익률, A + 2Bt + Ct²: 분산)
+        '''
+        best_w, best_sharpe = None, -np.inf
+        for t_high, t_low, a, b in self.segments:
+            candidates = [t_low]
+            if np.isinf(t_high):
+                candidates = [np.inf]
+            else:
+                candidates.append(t_high)
+                p, q = self.mu @ a - rf, self.mu @ b
+                A, B, C = a @ self.Sigma @ a, a @ self.Sigma @ b, b @ self.Sigma @ b
+                denom = q * B - p * C
+                if abs(denom) > self.tol:
+                    t_star = (p * B - q * A) / denom
+                    if t_low < t_star < t_high:
+                        candidates.append(t_star)
+            for t in candidates:
+                w = self._weights_at(t)
+                var = w @ self.Sigma @ w
+                if var <= 0:
+                    continue
+                sharpe = (w @ self.mu - rf) / np.sqrt(var)
+                if sharpe > best_sharpe:
+                    best_w, best_sharpe = w, sharpe
+        return best_w
@@ -0,0 +1,49 @@
+import numpy as np
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.spatial.distance import squareform
+
+def get_hrp_weights(Sigma: np.ndarray) -> np.ndarray:
+    '''
+    Hierarchical Risk Parity (López de Prado)
+    1. 상관계수 거리 d = sqrt((1 - ρ) / 2) 로 계층 군집 (single linkage)
+    2. 군집 순서로 공분산 재배열 (quasi-diagonalization)
+    3. 재귀 이분할: 두 군집의 역분산 포트폴리오 분산에 반비례해 비중 배분
+    반복 최적화 없이 long-only, 비중 합 1
+    '''
+    Sigma = np.asarray(Sigma, dtype=float)
+    n = Sigma.shape[0]
+    if n == 1:
+        return np.ones(1)
+
+    std = np.sqrt(np.diag(Sigma))
+    corr = np.clip(Sigma / np.outer(std, std), -1.0, 1.0)
+    dist = np.sqrt(np.clip((1.0 - corr) / 2.0, 0.0, None))
+    np.fill_diagonal(dist, 0.0)
+    order = leaves_list(linkage(squareform(dist, checks=False), method='single'))
+
+    weights = np.ones(n)
+    inv_var = 1.0 / np.diag(Sigma)
+    # 같은 깊이의 군집을 한번에 처리
+    clusters = [order]
+    while clusters:
+        next_clusters = []
+        for cluster in clusters:
+            if len(cluster) < 2:
+                continue
+            half = len(cluster) // 2
+            left, right = cluster[:half], cluster[half:]
+            var_left = _get_cluster_var(Sigma, inv_var, left)
+            var_right = _get_cluster_var(Sigma, inv_var, right)
+            alpha = 1.0 - var_left / (var_left + var_right)
+            weights[left] *= alpha
+            weights[right] *= 1.0 - alpha
+            next_clusters.extend([left, right])
+        clusters = next_clusters
+    return weights / weights.sum()
+
+def _get_cluster_var(Sigma: np.ndarray, inv_var: np.ndarray, cluster: np.ndarray) -> float:
+    '''
+    군집 내 역분산 비중 포트폴리오의 분산
+    '''
+    w = inv_var[cluster] / inv_var[cluster].sum()
+    return float(w @ Sigma[np.ix_(cluster, cluster)] @ w)
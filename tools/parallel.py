@@ -0,0 +1,131 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from tools.portfolio import get_mu_sigma, optimize_slsqp, solve_mean_variance
+
+from core.logger import get_logger, get_worker_log_queue, init_worker_logging
+logger = get_logger(__name__)
+
+def get_default_workers() -> int:
+    '''
+    OPT_WORKERS 환경변수, 없으면 CPU 수
+    '''
+    return int(os.getenv('OPT_WORKERS', 0)) or os.cpu_count() or 1
+
+# 워커 프로세스에서 붙은 공유 배열 {'returns': ndarray, 'mu': ..., 'Sigma': ...}
+_shared_arrays = {}
+_shared_blocks = []
+
+def _attach_shared(specs: dict, log_queue):
+    init_worker_logging(log_queue)
+    for key, (name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+        _shared_blocks.append(block)
+        _shared_arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+def _run_task(kind: str, params: dict, lambdas: list[float], rf: float, engine: str):
+    returns = _shared_arrays['returns']
+    mu_vec = _shared_arrays['mu']
+    Sigma_mat = _shared_arrays['Sigma']
+
+    if kind == 'lambda':
+        # 연속된 λ 묶음 -> 묶음 안에서는 warm start
+        result = optimize_slsqp(mu_vec, Sigma_mat, lambdas, rf, include_sharpe=False)
+    elif kind == 'sharpe':
+        result = optimize_slsqp(mu_vec, Sigma_mat, [], rf)
+    elif kind == 'subset':
+        idx = np.asarray(params['assets'])
+        result = solve_mean_variance(mu_vec[idx], Sigma_mat[np.ix_(idx, idx)], lambdas, rf, engine)
+    elif kind == 'lookback':
+        result = solve_mean_variance(*get_mu_sigma(returns[-params['days']:]), lambdas, rf, engine)
+    elif kind == 'bootstrap':
+        rng = np.random.default_rng(params['seed'])
+        rows = rng.integers(0, len(returns), len(returns))
+        result = solve_mean_variance(*get_mu_sigma(returns[rows]), lambdas, rf, engine)
+    else:
+        raise ValueError(f"Unknown task: {kind}")
+
+    result.pop('frontier', None)  # 구간 정보는 프로세스 간 전달하지 않음
+    result['task'] = {'kind': kind, **params}
+    return result
+
+class OptimizationScheduler:
+    '''
+    독립적인 최적화 문제(λ, 종목 부분집합, 기간, bootstrap 표본)를 프로세스 풀로 분산
+    수익률 / μ / Σ는 공유 메모리에 한번만 올리고 워커는 복사 없이 참조
+
+    with OptimizationScheduler(returns, max_workers=8) as scheduler:
+        result = scheduler.sweep_lambdas(np.linspace(1, 10, 100))
+    '''
+    def __init__(self, returns: np.ndarray, max_workers: int = None, engine: str = 'cla', rf: float = 0.03):
+        self.returns = np.ascontiguousarray(returns, dtype=float)
+        self.max_workers = max_workers or get_default_workers()
+        self.engine = engine
+        self.rf = rf
+        self._blocks = []
+        self._executor = None
+
+    def __enter__(self):
+        mu_vec, Sigma_mat = get_mu_sigma(self.returns)
+        specs = {}
+        for key, arr in (('returns', self.returns), ('mu', mu_vec), ('Sigma', Sigma_mat)):
+            block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+            self._blocks.append(block)
+            specs[key] = (block.name, arr.shape, arr.dtype)
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_attach_shared, initargs=(specs, get_worker_log_queue()))
+        return self
+
+    def __exit__(self, *exc):
+        self._executor.shutdown()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+
+    def _map(self, tasks: list[tuple[str, dict, list[float]]]) -> list[dict]:
+        started = time.perf_counter()
+        futures = [self._executor.submit(_run_task, kind, params, lambdas, self.rf, self.engine) for kind, params, lambdas in tasks]
+        results = [f.result() for f in futures]
+        logger.info(f'병렬 최적화 완료: {len(tasks)}건, 워커 {self.max_workers}개, {time.perf_counter() - started:.2f}초')
+        return results
+
+    def sweep_lambdas(self, lambdas: list[float]) -> dict:
+        '''
+        optimize_portfolio와 같은 형태의 결과
+        slsqp: λ를 워커 수만큼 연속 구간으로 나누고 Sharpe는 별도 작업으로 동시에 실행
+        cla: 투자선 한번으로 모든 λ가 계산되므로 작업 하나
+        '''
+        if self.engine != 'slsqp':
+            return self._map([('subset', {'assets': list(range(self.returns.shape[1]))}, lambdas)])[0]
+
+        # λ가 없으면 묶음 없이 Sharpe 작업만 (array_split은 0개로 나눌 수 없음)
+        chunks = [list(c) for c in np.array_split(sorted(lambdas), max(1, min(self.max_workers, len(lambdas)))) if len(c)]
+        results = self._map([('lambda', {}, chunk) for chunk in chunks] + [('sharpe', {}, [])])
+        return {
+            'lambda_results': [r for res in results[:-1] for r in res['lambda_results']],
+            'sharpe': results[-1]['sharpe'],
+            'stats': {
+                'λ': [s for res in results[:-1] for s in res['stats']['λ']],
+                'sharpe': results[-1]['stats']['sharpe'],
+            }
+        }
+
+    def sweep_subsets(self, subsets: list[list[int]], lambdas: list[float]) -> list[dict]:
+        '''
+        subsets: 종목 위치(열 번호) 리스트
+        '''
+        return self._map([('subset', {'assets': list(subset)}, lambdas) for subset in subsets])
+
+    def sweep_lookbacks(self, lookbacks: list[int], lambdas: list[float]) -> list[dict]:
+        '''
+        lookbacks: 최근 거래일 수
+        '''
+        return self._map([('lookback', {'days': int(days)}, lambdas) for days in lookbacks])
+
+    def bootstrap(self, n_resamples: int, lambdas: list[float], seed: int = 0) -> list[dict]:
+        return self._map([('bootstrap', {'seed': seed + i}, lambdas) for i in range(n_resamples)])
@@ -1,13 +1,19 @@
 from unittest import result
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
+import time
 from datetime import datetime
 from scipy.optimize import minimize
 from sqlite3 import Connection
 
 from core import database
+from core.cache import result_cache
+from core.metrics import stage_seconds
+from tools.factor_model import get_factor_covariance
+from tools.frontier import EfficientFrontier
+from tools.hrp import get_hrp_weights
+from tools.render import render_lambda, render_sharpe
 from tools.utils import to_df
 
 from core.logger import get_logger
@@ -15,10 +21,31 @@ logger = get_logger(__name__)
 
 def negative_sharpe_ratio(w, mu, Sigma, rf):
     ret = np.dot(w, mu)
-    vol = np.sqrt(np.dot(w, np.dot(Sigma, w)))
+    vol = np.sqrt(np.dot(w, Sigma @ w))
     sharpe = (ret - rf) / vol
     return -sharpe
 
+def negative_sharpe_ratio_grad(w, mu, Sigma, rf):
+    Sigma_w = Sigma @ w
+    excess = np.dot(w, mu) - rf
+    vol = np.sqrt(np.dot(w, Sigma_w))
+    return -(mu / vol - excess * Sigma_w / vol**3)
+
+def negative_utility(w, mu, Sigma, lam, rf):
+    return -(np.dot(w, mu - rf) - lam * np.dot(w, Sigma @ w))
+
+def negative_utility_grad(w, mu, Sigma, lam, rf):
+    return -(mu - rf) + 2 * lam * (Sigma @ w)
+
+def get_solver_stats(result, elapsed: float):
+    return {
+        'success': bool(result.success),
+        '반복': int(result.nit),
+        '함수평가': int(result.nfev),
+        '기울기평가': int(result.njev),
+        '시간': elapsed
+    }
+
 def get_returns(conn: Connection, assets: list[str], start: str, end: str) -> pd.DataFrame:
     price_df = pd.DataFrame()
     for stock_code in assets:
@@ -29,13 +56,11 @@ def get_returns(conn: Connection, assets: list[str], start: str, end: str) -> pd
     return returns
 
 def get_lambda_result(lam, mu_vec, Sigma_mat, w0, bounds, constraints, rf):
-    def utility(w, mu, Sigma, lam):
-        return -(np.dot(w, mu - rf) - lam * np.dot(w, np.dot(Sigma, w)))
-    
     result = minimize(
-        utility,
+        negative_utility,
         w0,
-        args=(mu_vec, Sigma_mat, lam),
+        args=(mu_vec, Sigma_mat, lam, rf),
+        jac=negative_utility_grad,
         method='SLSQP',
         bounds=bounds,
         constraints=constraints
@@ -43,7 +68,7 @@ def get_lambda_result(lam, mu_vec, Sigma_mat, w0, bounds, constraints, rf):
     
     w_opt = result.x
     ret_opt = np.dot(w_opt, mu_vec)
-    var_opt = np.dot(w_opt, np.dot(Sigma_mat, w_opt))
+    var_opt = np.dot(w_opt, Sigma_mat @ w_opt)
     std_opt = np.sqrt(max(var_opt, 0.0))  # numerical guard
     util_opt = (ret_opt - rf) - lam * var_opt
 
@@ -54,6 +79,7 @@ def get_sharpe_result(mu_vec, Sigma_mat, w0, bounds, constraints, rf):
         negative_sharpe_ratio,
         w0,
         args=(mu_vec, Sigma_mat, rf),
+        jac=negative_sharpe_ratio_grad,
         method='SLSQP',
         bounds=bounds,
         constraints=constraints
@@ -61,41 +87,178 @@ def get_sharpe_result(mu_vec, Sigma_mat, w0, bounds, constraints, rf):
     
     w_opt = result.x
     ret_opt = np.dot(w_opt, mu_vec)
-    var_opt = np.dot(w_opt, np.dot(Sigma_mat, w_opt))
+    var_opt = np.dot(w_opt, Sigma_mat @ w_opt)
     std_opt = np.sqrt(var_opt)
     sharpe_opt = (ret_opt - rf) / std_opt
 
     return result, (w_opt, ret_opt, var_opt, std_opt, sharpe_opt)
 
-def optimize_portfolio(conn: Connection, assets: list[str], lambdas: list[float], start_date: datetime, end_date: datetime, rf=0.03):
+def get_portfolio_stats(w, mu_vec, Sigma_mat):
+    ret = np.dot(w, mu_vec)
+    var = np.dot(w, Sigma_mat @ w)
+    std = np.sqrt(max(var, 0.0))  # numerical guard
+    return ret, var, std
+
+def get_mu_sigma(returns):
+    '''
+    일간 수익률 (날짜, 종목) -> 연환산 기대수익률, 공분산
+    '''
+    returns = np.asarray(returns, dtype=float)
+    mu_vec = returns.mean(axis=0) * 252
+    Sigma_mat = np.atleast_2d(np.cov(returns, rowvar=False)) * 252
+    # numerical stability: ensure covariance is positive semi-definite  <- gpt가 뭐시기 해줌
+    if Sigma_mat.size:
+        Sigma_mat = Sigma_mat + 1e-8 * np.eye(Sigma_mat.shape[0])
+    return mu_vec, Sigma_mat
+
+def get_factor_mu_sigma(conn: Connection, returns: pd.DataFrame, start: str, end: str, n_factors: int = 3):
+    '''
+    get_mu_sigma와 같지만 Σ는 KOSPI + 주성분 팩터 모델 (tools.factor_model)
+    '''
+    kospi_ret = to_df(database.fetch_kospi(conn, start, end), 'date', ['close_price'])['close_price'].sort_index().pct_change()
+    market = kospi_ret.reindex(returns.index).fillna(0.0).values
+    mu_vec = returns.values.mean(axis=0) * 252
+    return mu_vec, get_factor_covariance(returns.values, market, n_factors)
+
+def optimize_portfolio(conn: Connection, assets: list[str], lambdas: list[float], start_date: datetime, end_date: datetime, rf=0.03, engine: str = 'cla', workers: int = 1, covariance: str = 'sample', n_factors: int = 3):
+    '''
+    engine
+        - 'cla': 효율적 투자선을 한번에 계산 (tools.frontier), 모든 λ 및 Sharpe 정확한 해
+        - 'slsqp': λ마다 scipy SLSQP
+        - 'hrp': Hierarchical Risk Parity (tools.hrp), λ와 무관하게 같은 비중
+    workers > 1 이면 slsqp λ sweep을 프로세스 풀에서 실행 (tools.parallel)
+    covariance
+        - 'sample': 표본 공분산
+        - 'factor': KOSPI + n_factors개 주성분 팩터 모델 (종목 수가 많을 때)
+    '''
     start = start_date.strftime('%Y%m%d')
     end = end_date.strftime('%Y%m%d')
-    returns = get_returns(conn, assets, start, end)
+    # stage_seconds 라벨은 (stage, function), 최적화는 실제로 푼 함수 (엔진별)
+    solver = getattr(ENGINES.get(engine), '__name__', engine)
+    with stage_seconds.time(stage='returns', function='get_returns'):
+        returns = get_returns(conn, assets, start, end)
     if returns.empty or len(returns.columns) == 0:
         raise ValueError("수익률 데이터가 비었습니다. 입력 종목/기간을 확인하세요.")
 
-    mu = returns.mean() * 252
-    Sigma = returns.cov() * 252
+    used_assets = list(returns.columns)
+    if covariance == 'factor':
+        with stage_seconds.time(stage='covariance', function='get_factor_mu_sigma'):
+            mu_vec, Sigma_mat = get_factor_mu_sigma(conn, returns, start, end, n_factors)
+        with stage_seconds.time(stage='optimize', function=solver):
+            result = solve_mean_variance(mu_vec, Sigma_mat, lambdas, rf, engine)
+    elif covariance != 'sample':
+        raise ValueError(f"Unknown covariance: {covariance}")
+    elif engine == 'slsqp' and workers > 1:
+        from tools.parallel import OptimizationScheduler  # tools.parallel imports this module
+        with stage_seconds.time(stage='optimize', function='sweep_lambdas'):
+            with OptimizationScheduler(returns.values, max_workers=workers, engine=engine, rf=rf) as scheduler:
+                result = scheduler.sweep_lambdas(lambdas)
+    else:
+        with stage_seconds.time(stage='covariance', function='get_mu_sigma'):
+            mu_vec, Sigma_mat = get_mu_sigma(returns.values)
+        with stage_seconds.time(stage='optimize', function=solver):
+            result = solve_mean_variance(mu_vec, Sigma_mat, lambdas, rf, engine)
+    result['stock_codes'] = used_assets
+    return result
 
-    mu_vec = mu.values
-    Sigma_mat = Sigma.values
-    # numerical stability: ensure covariance is positive semi-definite  <- gpt가 뭐시기 해줌
-    if Sigma_mat.size:
-        Sigma_mat = Sigma_mat + 1e-8 * np.eye(Sigma_mat.shape[0])
+def solve_mean_variance(mu_vec, Sigma_mat, lambdas: list[float], rf=0.03, engine: str = 'cla'):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    return ENGINES[engine](mu_vec, Sigma_mat, lambdas, rf)
 
-    used_assets = list(returns.columns)
-    n = len(used_assets)
+def optimize_frontier(mu_vec, Sigma_mat, lambdas: list[float], rf=0.03):
+    started = time.perf_counter()
+    frontier = EfficientFrontier(mu_vec, Sigma_mat)
+
+    lambda_results = []
+    for lam in lambdas:
+        w_opt = frontier.weights_for_lambda(lam)
+        ret_opt, var_opt, std_opt = get_portfolio_stats(w_opt, mu_vec, Sigma_mat)
+        lambda_results.append({
+            'λ': lam,
+            '기대수익률': ret_opt,
+            '표준편차': std_opt,
+            '효용값': (ret_opt - rf) - lam * var_opt,
+            '비중': w_opt
+        })
+
+    w_opt_sharpe = frontier.max_sharpe(rf)
+    ret_opt_sharpe, var_opt_sharpe, std_opt_sharpe = get_portfolio_stats(w_opt_sharpe, mu_vec, Sigma_mat)
+    sharpe = {
+        '기대수익률': ret_opt_sharpe,
+        '표준편차': std_opt_sharpe,
+        'Sharpe 비율': (ret_opt_sharpe - rf) / std_opt_sharpe,
+        '비중': w_opt_sharpe
+    }
+
+    return {
+        'lambda_results': lambda_results,
+        'sharpe': sharpe,
+        'frontier': frontier,
+        'stats': {
+            '구간': len(frontier.segments),
+            '시간': time.perf_counter() - started
+        }
+    }
+
+def optimize_hrp(mu_vec, Sigma_mat, lambdas: list[float], rf=0.03):
+    '''
+    HRP 비중은 기대수익률/λ를 쓰지 않음
+    결과 형태를 맞추기 위해 모든 λ와 sharpe에 같은 비중을 넣고 각각의 효용값, Sharpe 비율을 계산
+    '''
+    started = time.perf_counter()
+    if not isinstance(Sigma_mat, np.ndarray):
+        Sigma_mat = Sigma_mat.to_dense()
+    w_opt = get_hrp_weights(Sigma_mat)
+    ret_opt, var_opt, std_opt = get_portfolio_stats(w_opt, mu_vec, Sigma_mat)
+
+    lambda_results = [{
+        'λ': lam,
+        '기대수익률': ret_opt,
+        '표준편차': std_opt,
+        '효용값': (ret_opt - rf) - lam * var_opt,
+        '비중': w_opt
+    } for lam in lambdas]
+    sharpe = {
+        '기대수익률': ret_opt,
+        '표준편차': std_opt,
+        'Sharpe 비율': (ret_opt - rf) / std_opt,
+        '비중': w_opt
+    }
+
+    return {
+        'lambda_results': lambda_results,
+        'sharpe': sharpe,
+        'stats': {
+            '시간': time.perf_counter() - started
+        }
+    }
+
+def optimize_slsqp(mu_vec, Sigma_mat, lambdas: list[float], rf=0.03, include_sharpe: bool = True):
+    '''
+    λ 오름차순으로 직전 해에서 시작 (warm start), 해석적 기울기 이용
+    include_sharpe=False 이면 Sharpe 최적화 생략 (sharpe: None)
+    '''
+    started = time.perf_counter()
+    n = len(mu_vec)
     w0 = np.ones(n) / n
     bounds = tuple((0, 1) for _ in range(n))
-    sum_to_one = {'type': 'eq', 'fun': lambda w: np.sum(w) - 1}
+    sum_to_one = {'type': 'eq', 'fun': lambda w: np.sum(w) - 1, 'jac': lambda w: np.ones_like(w)}
 
     lambda_results = []
-    for lam in lambdas:
+    lambda_stats = []
+    best_w, best_sharpe = w0, -np.inf
+    for lam in sorted(lambdas):
+        t = time.perf_counter()
         result, (w_opt, ret_opt, var_opt, std_opt, util_opt) = get_lambda_result(lam, mu_vec, Sigma_mat, w0, bounds, [sum_to_one], rf)
+        lambda_stats.append({'λ': lam, **get_solver_stats(result, time.perf_counter() - t)})
         if not result.success:
             logger.info(f"λ={lam} 최적화 실패: {result.message}")
             continue
 
+        w0 = w_opt
+        if std_opt > 0 and (ret_opt - rf) / std_opt > best_sharpe:
+            best_w, best_sharpe = w_opt, (ret_opt - rf) / std_opt
         lambda_results.append({
             'λ': lam,
             '기대수익률': ret_opt,
@@ -104,7 +267,20 @@ def optimize_portfolio(conn: Connection, assets: list[str], lambdas: list[float]
             '비중': w_opt
         })
 
-    result, (w_opt_sharpe, ret_opt_sharpe, var_opt_sharpe, std_opt_sharpe, sharpe_opt) = get_sharpe_result(mu_vec, Sigma_mat, w0, bounds, [sum_to_one], rf)
+    if not include_sharpe:
+        return {
+            'lambda_results': lambda_results,
+            'sharpe': None,
+            'stats': {
+                'λ': lambda_stats,
+                '시간': time.perf_counter() - started
+            }
+        }
+
+    # Sharpe는 λ 결과 중 Sharpe가 가장 높은 비중에서 시작
+    t = time.perf_counter()
+    result, (w_opt_sharpe, ret_opt_sharpe, var_opt_sharpe, std_opt_sharpe, sharpe_opt) = get_sharpe_result(mu_vec, Sigma_mat, best_w, bounds, [sum_to_one], rf)
+    sharpe_stats = get_solver_stats(result, time.perf_counter() - t)
     if not result.success:
         logger.info(f"sharpe 최적화 실패: {result.message}")
     
@@ -118,10 +294,25 @@ def optimize_portfolio(conn: Connection, assets: list[str], lambdas: list[float]
     return {
         'lambda_results': lambda_results,
         'sharpe': sharpe,
-        'stock_codes': used_assets,
+        'stats': {
+            'λ': lambda_stats,
+            'sharpe': sharpe_stats,
+            '시간': time.perf_counter() - started
+        }
     }
 
-def graph_lambda(conn, results, assets):
+ENGINES = {
+    'cla': optimize_frontier,
+    'slsqp': optimize_slsqp,
+    'hrp': optimize_hrp,
+}
+
+def optimize_portfolio_cached(conn: Connection, assets: list[str], lambdas: list[float], start_date: datetime, end_date: datetime, rf=0.03, engine: str = 'cla', covariance: str = 'sample'):
+    key = ('portfolio', tuple(assets), tuple(lambdas), start_date.strftime('%Y%m%d'), end_date.strftime('%Y%m%d'), rf, engine, covariance)
+    return result_cache.get_or_compute(
+        conn, key, lambda: optimize_portfolio(conn, assets, lambdas, start_date, end_date, rf, engine, covariance=covariance))
+
+def graph_lambda(conn, results, assets, renderer=None, key=None):
     today = datetime.now().strftime('%Y%m%d')
     names = to_df(database.fetch_all_companies(conn), 'stock_code')['name']
 
@@ -153,37 +344,15 @@ def graph_lambda(conn, results, assets):
     returns_values = [r['기대수익률'] for r in results]
     stddev_values = [r['표준편차'] for r in results]
 
-    # Create a single figure with two subplots (vertically stacked)
-    fig, axes = plt.subplots(2, 1, figsize=(10, 12))
-
-    # 첫 번째 그래프: λ별 상위 5개 자산 권장 비중
-    ax1 = axes[0]
-    for i in top5_indices:
-        ax1.plot(lambda_values, weights_matrix[:, i], marker='o', label=names[assets[i]])
-    ax1.set_title("λ별 상위 5개 자산 권장 보유 비중")
-    ax1.set_xlabel("λ (위험회피계수)")
-    ax1.set_ylabel("자산 비중")
-    ax1.set_ylim(0, 1)
-    ax1.legend()
-    ax1.grid(True)
-
-    # 두 번째 그래프: λ별 기대수익률 및 표준편차
-    ax2 = axes[1]
-    ax2.plot(lambda_values, returns_values, marker='o', label='기대수익률')
-    ax2.plot(lambda_values, stddev_values, marker='s', label='표준편차')
-    ax2.set_title("λ별 기대수익률 및 표준편차")
-    ax2.set_xlabel("λ (위험회피계수)")
-    ax2.set_ylabel("비율")
-    ax2.set_ylim(0, max(max(returns_values), max(stddev_values)) * 1.1)
-    ax2.legend()
-    ax2.grid(True)
-
-    plt.tight_layout()
-    plt.savefig(f"results/lambda/lambda_{today}.png")
-    # plt.show()
-
-
-def graph_sharpe(conn, result, assets):
+    name = f"lambda/lambda_{today}.png"
+    args = (lambda_values, weights_matrix[:, top5_indices].tolist(), [names[assets[i]] for i in top5_indices], returns_values, stddev_values)
+    # renderer가 있으면 백그라운드 프로세스에서 생성
+    if renderer is not None:
+        return renderer.submit(render_lambda, name, *args, key=key)
+    return render_lambda(f"results/{name}", *args)
+
+
+def graph_sharpe(conn, result, assets, renderer=None, key=None):
     today = datetime.now().strftime('%Y%m%d')
     names = to_df(database.fetch_companies(conn, assets), 'stock_code')['name']
     
@@ -205,12 +374,7 @@ def graph_sharpe(conn, result, assets):
         sorted_names.append(names.loc[stock_code])
         sorted_weights.append(weight)
 
-    plt.figure(figsize=(10, 6))
-    plt.bar(sorted_names, sorted_weights)
-    plt.title("Sharpe 최적화 포트폴리오 자산 비중")
-    plt.ylabel("비중")
-    plt.ylim(0, 1)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.savefig(f"results/sharpe/sharpe_{today}.png")
-    # plt.show()
\ No newline at end of file
+    name = f"sharpe/sharpe_{today}.png"
+    if renderer is not None:
+        return renderer.submit(render_sharpe, name, sorted_names, sorted_weights, key=key)
+    return render_sharpe(f"results/{name}", sorted_names, sorted_weights)
@@ -0,0 +1,175 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+
+from core.metrics import stage_seconds
+
+from core.logger import get_logger, get_worker_log_queue, init_worker_logging
+logger = get_logger(__name__)
+
+def _init_worker(log_queue):
+    init_worker_logging(log_queue)
+    import matplotlib
+    matplotlib.use('Agg')
+
+def _new_figure(figsize):
+    # pyplot 전역 상태를 쓰지 않는 Figure (스레드/프로세스 어디서든 안전)
+    from matplotlib.figure import Figure
+    return Figure(figsize=figsize)
+
+def render_lambda(path: str, lambda_values, weights, labels, returns_values, stddev_values) -> str:
+    '''
+    λ별 상위 자산 비중 + 기대수익률/표준편차 (weights: (λ, 상위 자산))
+    '''
+    fig = _new_figure((10, 12))
+    ax1, ax2 = fig.subplots(2, 1)
+
+    # 첫 번째 그래프: λ별 상위 5개 자산 권장 비중
+    for i, label in enumerate(labels):
+        ax1.plot(lambda_values, [row[i] for row in weights], marker='o', label=label)
+    ax1.set_title("λ별 상위 5개 자산 권장 보유 비중")
+    ax1.set_xlabel("λ (위험회피계수)")
+    ax1.set_ylabel("자산 비중")
+    ax1.set_ylim(0, 1)
+    ax1.legend()
+    ax1.grid(True)
+
+    # 두 번째 그래프: λ별 기대수익률 및 표준편차
+    ax2.plot(lambda_values, returns_values, marker='o', label='기대수익률')
+    ax2.plot(lambda_values, stddev_values, marker='s', label='표준편차')
+    ax2.set_title("λ별 기대수익률 및 표준편차")
+    ax2.set_xlabel("λ (위험회피계수)")
+    ax2.set_ylabel("비율")
+    ax2.set_ylim(0, max(max(returns_values), max(stddev_values)) * 1.1)
+    ax2.legend()
+    ax2.grid(True)
+
+    fig.tight_layout()
+    return _save(fig, path)
+
+def render_sharpe(path: str, names: list[str], weights: list[float]) -> str:
+    fig = _new_figure((10, 6))
+    ax = fig.subplots()
+    ax.bar(names, weights)
+    ax.set_title("Sharpe 최적화 포트폴리오 자산 비중")
+    ax.set_ylabel("비중")
+    ax.set_ylim(0, 1)
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    fig.tight_layout()
+    return _save(fig, path)
+
+def _render_timed(render, path: str, *args) -> float:
+    # 워커 프로세스의 지표는 메인으로 돌아오지 않으므로 걸린 시간을 반환
+    started = time.perf_counter()
+    render(path, *args)
+    return time.perf_counter() - started
+
+def _save(fig, path: str) -> str:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path)
+    fig.clear()
+    return path
+
+class ChartRenderer:
+    '''
+    차트를 별도 프로세스(Agg backend)에서 그리고 생성된 이미지 목록(index.json)을 관리
+    - 요청 스레드는 데이터만 넘기고 바로 반환 (Future)
+    - 같은 파일을 같은 key(데이터 버전 + 파라미터)로 다시 요청하면 그리지 않음
+    - 이미지 목록은 index.json에서 읽으므로 페이지 조회 시 디렉터리를 탐색하지 않음
+    '''
+    def __init__(self, base: str = 'results', max_workers: int = 1):
+        self.base = Path(base)
+        self.max_workers = max_workers
+        self._index_path = self.base / 'index.json'
+        self._index: dict[str, dict] = None
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_index(self) -> dict[str, dict]:
+        # lock 안에서 호출, 처음 사용할 때 한번 읽음
+        if self._index is None:
+            self._index = {}
+            self._load_index()
+        return self._index
+
+    def _load_index(self):
+        if self._index_path.exists():
+            try:
+                with open(self._index_path, 'r', encoding='utf-8') as f:
+                    self._index = {entry['name']: entry for entry in json.load(f)}
+                return
+            except (OSError, ValueError) as e:
+                logger.warning(f'이미지 목록 읽기 실패, 다시 생성: {e}')
+        # 최초 1회만 기존 이미지 탐색
+        if self.base.exists():
+            for p in self.base.rglob('*.png'):
+                name = p.relative_to(self.base).as_posix()
+                self._index[name] = {'name': name, 'url': f'/results/{name}', 'created': datetime.fromtimestamp(p.stat().st_mtime).isoformat(timespec='seconds'), 'key': None}
+            self._save_index()
+
+    def _save_index(self):
+        self.base.mkdir(parents=True, exist_ok=True)
+        tmp = self._index_path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(list(self._index.values()), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._index_path)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # fork 대신 spawn: 서버 프로세스의 스레드/락 상태를 물려받지 않음
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(get_worker_log_queue(),)
+            )
+        return self._executor
+
+    def submit(self, render, name: str, *args, key=None) -> Future:
+        '''
+        render(path, *args)를 워커에서 실행, name은 base 기준 상대 경로
+        Future 결과는 그리는 데 걸린 시간 (이미 있으면 0)
+        '''
+        with self._lock:
+            entry = self._get_index().get(name)
+        if key is not None and entry and entry['key'] == repr(key) and (self.base / name).exists():
+            future = Future()
+            future.set_result(0.0)
+            return future
+
+        future = self._get_executor().submit(_render_timed, render, str(self.base / name), *args)
+        future.add_done_callback(lambda f: self._on_done(f, name, key, render))
+        return future
+
+    def _on_done(self, future: Future, name: str, key, render):
+        if future.exception() is not None:
+            logger.error(f'차트 생성 실패: {name}, {future.exception()}')
+            if isinstance(future.exception(), BrokenProcessPool):
+                # 워커가 죽으면 다음 요청에서 새 풀 생성
+                with self._lock:
+                    self._executor = None
+            return
+        stage_seconds.observe(future.result(), stage='render', function=getattr(render, '__name__', 'render'))
+        with self._lock:
+            self._get_index()[name] = {'name': name, 'url': f'/results/{name}', 'created': datetime.now().isoformat(timespec='seconds'), 'key': None if key is None else repr(key)}
+            self._save_index()
+        logger.info(f'차트 생성: {name}')
+
+    def list_images(self) -> list[dict]:
+        with self._lock:
+            return sorted(self._get_index().values(), key=lambda x: x['name'])
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+chart_renderer = ChartRenderer()
@@ -0,0 +1,131 @@
+import math
+from dataclasses import replace
+from sqlite3 import Connection
+
+from core import database
+from core.schemas import RiskMetrics
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+EWMA_DECAY = 0.94  # RiskMetrics 일간 기준
+
+def get_holdings(kiwoom_api) -> dict[str, int]:
+    '''
+    키움 계좌평가잔고 -> {종목코드: 보유수량}
+    '''
+    data = kiwoom_api.get_account_stock_info()
+    holdings = {}
+    for item in data.get('acnt_evlt_remn_indv_tot', []):
+        stock_code = item['stk_cd'].lstrip('A')  # 'A005930' 형태로 오는 경우
+        qty = int(str(item.get('rmnd_qty', '0')).replace(',', '') or 0)
+        if qty > 0:
+            holdings[stock_code] = qty
+    return holdings
+
+def get_close_prices(conn: Connection, date: str) -> dict[str, float]:
+    return {d.stock_code: d.close_price for d in database.fetch_stock_day_by_date(conn, date)}
+
+def update_risk_metrics(conn: Connection, date: str, holdings: dict[str, int]) -> RiskMetrics|None:
+    '''
+    직전 행의 누적 상태에서 하루치만 반영 (과거 전체를 다시 읽지 않음)
+    수익률은 오늘 보유수량 기준 직전일 대비 평가금액 변화 (입출금/매매 영향 제외)
+    상태 초기화는 이전 행이 없을 때만, 비교할 가격이 없으면 그날은 건너뛰고 이전 상태 유지
+    '''
+    if not holdings:
+        logger.info(f'보유 종목 없음, 위험지표 건너뜀: {date}')
+        return None
+    prices = get_close_prices(conn, date)
+    missing = [stock_code for stock_code in holdings if stock_code not in prices]
+    if missing:
+        # companies에 없는 종목은 가격을 저장하지 않으므로 계속 빠짐
+        tracked = {company.stock_code for company in database.fetch_companies(conn, missing)}
+        untracked = [stock_code for stock_code in missing if stock_code not in tracked]
+        if untracked:
+            logger.warning(f'추적하지 않는 보유 종목 (companies에 없음, 가격 없음): {untracked}, 위험지표 건너뜀: {date}')
+        if len(untracked) < len(missing):
+            logger.warning(f'보유 종목 가격 없음: {[c for c in missing if c in tracked]}, 위험지표 건너뜀: {date}')
+        return None
+    value = float(sum(qty * prices[stock_code] for stock_code, qty in holdings.items()))
+
+    prev = database.fetch_last_risk_metrics(conn, date)
+    if prev is None:
+        # 첫날: 상태 초기화
+        metrics = RiskMetrics(
+            date=date, portfolio_value=value, daily_return=None, kospi_return=None,
+            nav=1.0, peak_nav=1.0, drawdown=0.0, volatility=None, ewma_volatility=None, beta=None, tracking_error=None,
+            n=0, mean_return=0.0, mean_kospi=0.0, mean_active=0.0, m2_return=0.0, m2_kospi=0.0, m2_active=0.0,
+            c_return_kospi=0.0, ewma_var=0.0
+        )
+        database.insert_risk_metrics(conn, metrics)
+        logger.info(f'위험지표 초기화: {date}')
+        return metrics
+
+    # date 열은 정수로 저장되므로 문자열로 맞춰 비교
+    date, prev_date = str(date), str(prev.date)
+    kospi = {str(k.date): k.close_price for k in database.fetch_kospi(conn, prev_date, date)}
+    if date not in kospi or prev_date not in kospi:
+        logger.warning(f'KOSPI 가격 없음 ({prev_date} / {date}), 위험지표 건너뜀 (이전 상태 유지)')
+        return None
+    # 직전일 가격이 없는 종목 (신규 상장 등)은 수익률 계산에서 제외
+    prev_prices = get_close_prices(conn, prev_date)
+    common = [stock_code for stock_code in holdings if prev_prices.get(stock_code)]
+    if not common:
+        logger.warning(f'{prev_date} 보유 종목 가격 없음, 위험지표 건너뜀 (이전 상태 유지): {date}')
+        return None
+    if len(common) < len(holdings):
+        logger.warning(f'{prev_date} 가격 없는 종목 제외하고 수익률 계산: {[c for c in holdings if c not in common]}')
+
+    ret = sum(holdings[c] * prices[c] for c in common) / sum(holdings[c] * prev_prices[c] for c in common) - 1
+    mkt = kospi[date] / kospi[prev_date] - 1
+    metrics = step_risk_metrics(prev, date, value, ret, mkt)
+    database.insert_risk_metrics(conn, metrics)
+    logger.info(f'위험지표 갱신: {date}, 변동성 {metrics.volatility}, 낙폭 {metrics.drawdown:.2%}, beta {metrics.beta}')
+    return metrics
+
+def step_risk_metrics(prev: RiskMetrics, date: str, value: float, ret: float, mkt: float) -> RiskMetrics:
+    '''
+    Welford 방식으로 평균/분산/공분산 O(1) 갱신
+    '''
+    active = ret - mkt
+    n = prev.n + 1
+
+    d_ret = ret - prev.mean_return
+    mean_return = prev.mean_return + d_ret / n
+    d_mkt = mkt - prev.mean_kospi
+    mean_kospi = prev.mean_kospi + d_mkt / n
+    d_active = active - prev.mean_active
+    mean_active = prev.mean_active + d_active / n
+
+    m2_return = prev.m2_return + d_ret * (ret - mean_return)
+    m2_kospi = prev.m2_kospi + d_mkt * (mkt - mean_kospi)
+    m2_active = prev.m2_active + d_active * (active - mean_active)
+    c_return_kospi = prev.c_return_kospi + d_ret * (mkt - mean_kospi)
+    ewma_var = ret * ret if prev.n == 0 else EWMA_DECAY * prev.ewma_var + (1 - EWMA_DECAY) * ret * ret
+
+    nav = prev.nav * (1 + ret)
+    peak_nav = max(prev.peak_nav, nav)
+
+    return replace(
+        prev,
+        date=date,
+        portfolio_value=value,
+        daily_return=ret,
+        kospi_return=mkt,
+        nav=nav,
+        peak_nav=peak_nav,
+        drawdown=1 - nav / peak_nav,
+        volatility=math.sqrt(m2_return / (n - 1) * 252) if n > 1 else None,
+        ewma_volatility=math.sqrt(ewma_var * 252),
+        beta=c_return_kospi / m2_kospi if m2_kospi > 0 else None,
+        tracking_error=math.sqrt(m2_active / (n - 1) * 252) if n > 1 else None,
+        n=n,
+        mean_return=mean_return,
+        mean_kospi=mean_kospi,
+        mean_active=mean_active,
+        m2_return=m2_return,
+        m2_kospi=m2_kospi,
+        m2_active=m2_active,
+        c_return_kospi=c_return_kospi,
+        ewma_var=ewma_var
+    )
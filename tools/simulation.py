@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+
+from tools.portfolio import get_mu_sigma
+
+from core.logger import get_logger
+logger = get_logger(__name__)
+
+def simulate_portfolio(weights, returns, method: str = 'parametric', n_paths: int = 10000, horizon: int = 252,
+                       block_size: int = 20, chunk_size: int = 2000, alpha: float = 0.05, seed: int = 0) -> dict:
+    '''
+    주어진 비중의 포트폴리오 수익 분포 시뮬레이션 (매일 같은 비중으로 리밸런싱)
+    returns: get_returns 결과 (날짜, 종목) 일간 수익률, weights와 같은 종목 순서
+    method
+        - 'parametric': μ/Σ 다변량 정규분포
+        - 'bootstrap': 과거 수익률을 block_size 거래일 단위로 재표집 (종목 간 상관, 단기 자기상관 유지)
+    경로는 chunk_size씩 나눠 생성하므로 메모리는 chunk_size x horizon 으로 제한됨
+    returns {
+        '최종자산': 분위수별 최종 자산 (초기 1),
+        '최대낙폭': 분위수별 최대 낙폭,
+        'VaR', 'CVaR': horizon 기간 손실 기준 (1 - alpha)
+    }
+    '''
+    started = time.perf_counter()
+    w = np.asarray(weights, dtype=float)
+    R = np.asarray(returns, dtype=float)
+    rng = np.random.default_rng(seed)
+
+    # 종목별 경로 대신 포트폴리오 수익률 (w'r)만 생성해도 분포는 동일
+    if method == 'parametric':
+        mu_vec, Sigma_mat = get_mu_sigma(R)
+        daily_mean = w @ mu_vec / 252
+        daily_std = np.sqrt(max(w @ (Sigma_mat @ w), 0.0) / 252)
+        draw = lambda size: rng.normal(daily_mean, daily_std, (size, horizon))
+    elif method == 'bootstrap':
+        port_ret = R @ w
+        T = len(port_ret)
+        n_blocks = -(-horizon // block_size)
+        offsets = np.arange(block_size)
+        def draw(size):
+            starts = rng.integers(0, T, (size, n_blocks))
+            idx = (starts[:, :, None] + offsets) % T  # 끝에 닿으면 처음으로 (circular)
+            return port_ret[idx.reshape(size, -1)[:, :horizon]]
+    else:
+        raise ValueError(f"Unknown method: {method}")
+
+    terminal = np.empty(n_paths)
+    max_drawdown = np.empty(n_paths)
+    for start in range(0, n_paths, chunk_size):
+        size = min(chunk_size, n_paths - start)
+        wealth = np.cumprod(1.0 + draw(size), axis=1)
+        peak = np.maximum(np.maximum.accumulate(wealth, axis=1), 1.0)
+        terminal[start:start + size] = wealth[:, -1]
+        max_drawdown[start:start + size] = (1.0 - wealth / peak).max(axis=1)
+
+    quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+    loss = 1.0 - terminal
+    var = np.quantile(loss, 1 - alpha)
+    result = {
+        '최종자산': dict(zip(quantiles, np.quantile(terminal, quantiles))),
+        '최대낙폭': dict(zip(quantiles, np.quantile(max_drawdown, quantiles))),
+        'VaR': var,
+        'CVaR': loss[loss >= var].mean(),
+        '경로수': n_paths,
+        '기간': horizon,
+        '시간': time.perf_counter() - started
+    }
+    logger.info(f"시뮬레이션({method}): {n_paths}개 경로, {horizon}일, VaR {result['VaR']:.2%}, CVaR {result['CVaR']:.2%}, {result['시간']:.2f}초")
+    return result
@@ -5,29 +5,91 @@ import numpy as np
 from sqlite3 import Connection
 
 from core import database
+from core.cache import result_cache
+from core.metrics import stage_seconds, timed
 from core.schemas import Company
 from tools.utils import to_df
 
 # TODO fix to reuse df
-def find_undervalued_assets(conn: Connection, companies: list[Company], start_date: datetime, end_date: datetime):
+@timed(stage_seconds, stage='screen')
+def find_undervalued_assets(conn: Connection, companies: list[Company], start_date: datetime, end_date: datetime, rf: float = 0.03, r: float = 0.03):
     start = start_date.strftime('%Y%m%d')
     end = end_date.strftime('%Y%m%d')
     company_df = to_df(companies, 'stock_code')
     dps_info = get_recent_dps_and_growth(conn, end_date.year)
-    capm_info = get_capm_required_return(conn, companies, start, end)
-    
+    capm_info = get_capm_required_return(conn, companies, start, end, rf)
+
     df = company_df.join(dps_info, how='left').join(capm_info, how='left')
-    df['fair_value'] = df.apply(lambda row: get_ggm_fair_value(
-        row['dps'], row['growth'], row['required_return']), axis=1)
-    
+    df['fair_value'] = get_ggm_fair_value(
+        df['dps'].to_numpy(dtype=float), df['growth'].to_numpy(dtype=float), df['required_return'].to_numpy(dtype=float))
+
     df['current_price'] = to_df(database.fetch_stock_day_by_date(conn, end), 'stock_code', ['close_price'])  # technically close price
-    alt_df = dcf_alternative(conn, companies, end_date)
+    alt_df = dcf_alternative(conn, companies, end_date, r)
     df = df.join(alt_df[['V', 'market_cap']], how='left')
 
     df['undervalued'] = (df['current_price'] < df['fair_value']) | (df['V'] > df['market_cap'])
 
     return df
 
+def find_undervalued_assets_cached(conn: Connection, start_date: datetime, end_date: datetime, rf: float = 0.03, r: float = 0.03):
+    '''
+    find_undervalued_assets 결과를 데이터 버전 단위로 캐시 (전체 종목 대상)
+    '''
+    key = ('undervalued', start_date.strftime('%Y%m%d'), end_date.strftime('%Y%m%d'), rf, r)
+    return result_cache.get_or_compute(
+        conn, key, lambda: find_undervalued_assets(conn, database.fetch_all_companies(conn), start_date, end_date, rf, r))
+
+@timed(stage_seconds, stage='screen')
+def sweep_undervalued_assets(conn: Connection, companies: list[Company], end_date: datetime, rfs: list[float], rs: list[float], lookbacks: list[int]) -> pd.DataFrame:
+    '''
+    (rf, r, lookback) 조합별 find_undervalued_assets 결과를 한번에 계산
+    - rf: CAPM 무위험수익률, r: dcf_alternative 할인율, lookback: beta 계산 기간(년)
+    데이터는 가장 긴 lookback 기준으로 한번만 조회하고 조합은 broadcasting으로 계산
+    returns DataFrame (lookback, rf, r, stock_code, required_return, fair_value, V, undervalued)
+    '''
+    empty = [name for name, grid in (('rfs', rfs), ('rs', rs), ('lookbacks', lookbacks)) if len(grid) == 0]
+    if empty:
+        raise ValueError(f"비어 있는 조합 목록: {', '.join(empty)}")
+    end = end_date.strftime('%Y%m%d')
+    start = (pd.Timestamp(end_date) - pd.DateOffset(years=max(lookbacks))).strftime('%Y%m%d')
+    assets = [company.stock_code for company in companies]
+    rfs = np.asarray(rfs, dtype=float)
+    rs = np.asarray(rs, dtype=float)
+
+    # beta (lookback x 종목)
+    kospi_price = to_df(database.fetch_kospi(conn, start, end), 'date', ['close_price'])['close_price'].sort_index()
+    prices = database.fetch_close_prices(conn, start, end, assets).reindex(index=kospi_price.index, columns=assets)
+    date_index = pd.to_datetime(kospi_price.index, format='%Y%m%d')
+    window_start = np.array([date_index.searchsorted(pd.Timestamp(end_date.date()) - pd.DateOffset(years=lb)) for lb in lookbacks])
+    window_end = np.full(len(lookbacks), len(date_index) - 1)
+    market_return, beta = get_rolling_capm_beta(
+        get_daily_returns(prices).to_numpy(dtype=float), kospi_price.pct_change().to_numpy(dtype=float), window_start, window_end)
+
+    # (lookback, rf, 종목)
+    required_return = rfs[None, :, None] + beta[:, None, :] * (market_return[:, None, :] - rfs[None, :, None])
+    dps_info = get_recent_dps_and_growth(conn, end_date.year).reindex(assets)
+    fair_value = get_ggm_fair_value(dps_info['dps'].to_numpy(dtype=float), dps_info['growth'].to_numpy(dtype=float), required_return)
+
+    # (r, 종목)
+    alt_df = get_residual_income_inputs(conn, companies, end_date).reindex(assets)
+    V = get_residual_income_value(
+        alt_df['capital'].to_numpy(dtype=float), alt_df['net_profit'].to_numpy(dtype=float),
+        alt_df['net_profit_pprev'].to_numpy(dtype=float), rs[:, None])
+
+    current_price = to_df(database.fetch_stock_day_by_date(conn, end), 'stock_code', ['close_price'])['close_price'].reindex(assets).to_numpy(dtype=float)
+    market_cap = alt_df['market_cap'].to_numpy(dtype=float)
+
+    # (lookback, rf, r, 종목)
+    shape = (len(lookbacks), len(rfs), len(rs), len(assets))
+    undervalued = (current_price < fair_value)[:, :, None, :] | (V > market_cap)[None, None, :, :]
+    index = pd.MultiIndex.from_product([lookbacks, rfs, rs, assets], names=['lookback', 'rf', 'r', 'stock_code'])
+    return pd.DataFrame({
+        'required_return': np.broadcast_to(required_return[:, :, None, :], shape).ravel(),
+        'fair_value': np.broadcast_to(fair_value[:, :, None, :], shape).ravel(),
+        'V': np.broadcast_to(V[None, None, :, :], shape).ravel(),
+        'undervalued': undervalued.ravel(),
+    }, index=index).reset_index()
+
 def get_recent_dps_and_growth(conn: Connection, year: int) -> pd.DataFrame:
     '''
     제작년 및 작년 배당금 이용
@@ -37,7 +99,7 @@ def get_recent_dps_and_growth(conn: Connection, year: int) -> pd.DataFrame:
     dps_df['dps'] = to_df(database.fetch_stock_year(conn, year-1), 'stock_code', ['dps'])
     dps_df['dps_prev'] = to_df(database.fetch_stock_year(conn, year-2), 'stock_code', ['dps'])
 
-    dps_df['growth'] = dps_df.apply(lambda row: (row['dps'] / row['dps_prev']) - 1 if row['dps_prev'] > 0 else 0.0, axis=1)
+    dps_df['growth'] = get_dps_growth(dps_df['dps'].to_numpy(dtype=float), dps_df['dps_prev'].to_numpy(dtype=float))
 
     return dps_df
 
@@ -48,62 +110,134 @@ def get_capm_required_return(conn: Connection, companies: list[Company], start:
         - market_return: annualized market return
         - required_return: required return
     '''
-    results = []
-    for company in companies:
-        stock_code = company.stock_code
-        stock_price = to_df(database.fetch_stock_day_by_stock(conn, stock_code, start, end), 'date', ['close_price']).sort_index()
-        stock_ret = stock_price['close_price'].pct_change()
-
-        kospi_price = to_df(database.fetch_kospi(conn, start, end), 'date', ['close_price'])
-        if kospi_price.empty:
-            raise ValueError(f"KOSPI data is empty for {start} to {end}")
-        kospi_ret = kospi_price['close_price'].pct_change()
-
-        # Align both Series on their common dates
-        common_dates = stock_ret.index.intersection(kospi_ret.index)
-        stock_ret_aligned = stock_ret.loc[common_dates]
-        kospi_ret_aligned = kospi_ret.loc[common_dates]
-
-        aligned = pd.concat([stock_ret_aligned, kospi_ret_aligned], axis=1, keys=["stock", "market"]).dropna()
-        if aligned.empty:
-            print(f"{stock_code} data empty")
-            continue
-
-        mkt_mean_daily = aligned["market"].mean()
-        mkt_annual = mkt_mean_daily * 252
-
-        cov = np.cov(aligned["stock"], aligned["market"])[0, 1]
-        var_mkt = aligned["market"].var()
-        beta = cov / var_mkt
-
-        required_return = rf + beta * (mkt_annual - rf)
-        results.append({
-            "stock_code": stock_code,
-            "market_return": mkt_annual,  # 필요없음?
-            "required_return": required_return
-        })
-    return pd.DataFrame(results).set_index("stock_code")
-
-def get_ggm_fair_value(recent_dps: float, g: float, r: float):
-    if r <= g:  # 배당금 없거나 신생기업의 경우 g == 0.0으로 설정됨
-        return np.nan
-
-    fair_value = recent_dps * (1 + g) / (r - g)
+    kospi_price = to_df(database.fetch_kospi(conn, start, end), 'date', ['close_price']).sort_index()
+    if kospi_price.empty:
+        raise ValueError(f"KOSPI data is empty for {start} to {end}")
+    kospi_ret = kospi_price['close_price'].pct_change()
+
+    assets = [company.stock_code for company in companies]
+    stock_ret = get_daily_returns(database.fetch_close_prices(conn, start, end, assets))
+
+    # Align both on their common dates
+    common_dates = stock_ret.index.intersection(kospi_ret.index)
+    stock_ret = stock_ret.loc[common_dates].reindex(columns=assets)
+    # 구간 하나 (window_start=-1: 첫 행 포함 전체 기간)
+    market_return, beta = get_rolling_capm_beta(
+        stock_ret.to_numpy(dtype=float), kospi_ret.loc[common_dates].to_numpy(dtype=float), np.array([-1]), np.array([len(common_dates) - 1]))
+    market_return, beta = market_return[0], beta[0]
+
+    df = pd.DataFrame({
+        'stock_code': assets,
+        'market_return': market_return,  # 필요없음?
+        'required_return': rf + beta * (market_return - rf)
+    }).set_index('stock_code')
+    return df.dropna()
+
+def get_daily_returns(prices: pd.DataFrame) -> pd.DataFrame:
+    '''
+    종목별로 직전 거래일 종가 대비 수익률 (거래정지 등으로 빈 날짜는 건너뜀)
+    '''
+    return prices / prices.ffill().shift(1) - 1
+
+def get_rolling_capm_beta(stock_ret: np.ndarray, market_ret: np.ndarray, window_start: np.ndarray, window_end: np.ndarray):
+    '''
+    누적합으로 [window_start, window_end] 구간별 beta를 한번에 계산
+    stock_ret: (날짜, 종목) 일간 수익률, market_ret: (날짜,) 일간 시장 수익률
+    종목별로 둘 다 값이 있는 날짜만 이용, 구간 첫날 수익률은 구간 밖 가격을 이용하므로 제외
+    데이터가 부족하면 NaN
+    returns (연환산 시장 수익률, beta), 각각 (구간 수, 종목 수)
+    '''
+    mask = ~np.isnan(stock_ret) & ~np.isnan(market_ret)[:, None]
+    s = np.where(mask, stock_ret, 0.0)
+    m = np.where(mask, market_ret[:, None], 0.0)
+
+    def window_sum(x):
+        cum = np.zeros((x.shape[0] + 1, x.shape[1]))
+        np.cumsum(x, axis=0, out=cum[1:])
+        return cum[window_end + 1] - cum[window_start + 1]
+
+    n = window_sum(mask.astype(float))
+    sum_s = window_sum(s)
+    sum_m = window_sum(m)
+    sum_sm = window_sum(s * m)
+    sum_mm = window_sum(m * m)
+
+    valid = n >= 2
+    n_safe = np.where(valid, n, 2)
+    cov = (sum_sm - sum_s * sum_m / n_safe) / (n_safe - 1)
+    var_mkt = (sum_mm - sum_m * sum_m / n_safe) / (n_safe - 1)
+    valid &= var_mkt > 0
+
+    beta = np.full(n.shape, np.nan)
+    np.divide(cov, var_mkt, out=beta, where=valid)
+    market_return = np.where(valid, sum_m / n_safe * 252, np.nan)
+    return market_return, beta
+
+def get_dps_growth(dps, dps_prev):
+    '''
+    dps_prev가 0 이하(또는 없음)면 성장률 0.0
+    '''
+    dps = np.asarray(dps, dtype=float)
+    dps_prev = np.asarray(dps_prev, dtype=float)
+    valid = dps_prev > 0
+    growth = np.zeros(np.broadcast(dps, dps_prev).shape)
+    np.divide(dps, dps_prev, out=growth, where=valid)
+    return np.where(valid, growth - 1, 0.0)
+
+def get_ggm_fair_value(recent_dps, g, r):
+    '''
+    r <= g 이면 NaN (배당금 없거나 신생기업의 경우 g == 0.0으로 설정됨)
+    '''
+    recent_dps = np.asarray(recent_dps, dtype=float)
+    g = np.asarray(g, dtype=float)
+    r = np.asarray(r, dtype=float)
+    spread = r - g
+    valid = spread > 0
+    fair_value = np.full(np.broadcast(recent_dps, g, r).shape, np.nan)
+    np.divide(recent_dps * (1 + g), spread, out=fair_value, where=valid)
     return fair_value
 
-def dcf_alternative(conn: Connection, companies: list[Company], date: datetime, r: float = 0.03):
+def get_residual_income_value(capital, net_profit, net_profit_pprev, r):
+    '''
+    g = sqrt(net_profit / net_profit_pprev) - 1
+    V = B0 + (NI - r * B0) / (r - g)
+    net_profit_pprev <= 0, net_profit < 0, r <= g 이면 NaN
+    '''
+    capital = np.asarray(capital, dtype=float)
+    net_profit = np.asarray(net_profit, dtype=float)
+    net_profit_pprev = np.asarray(net_profit_pprev, dtype=float)
+    r = np.asarray(r, dtype=float)
+    shape = np.broadcast(capital, net_profit, net_profit_pprev, r).shape
+
+    valid = (net_profit_pprev > 0) & (net_profit >= 0)
+    ratio = np.zeros(shape)
+    np.divide(net_profit, net_profit_pprev, out=ratio, where=valid)
+    g = np.sqrt(ratio) - 1
+    ni = net_profit * g
+    spread = r - g
+    valid = valid & (spread > 0)
+
+    V = np.full(shape, np.nan)
+    np.divide(ni - r * capital, spread, out=V, where=valid)
+    return V + capital
+
+def get_residual_income_inputs(conn: Connection, companies: list[Company], date: datetime) -> pd.DataFrame:
+    '''
+    할인율과 무관한 잔여이익모델 입력 (market_cap, capital, net_profit, net_profit_pprev)
+    '''
     data = to_df(companies, 'stock_code')
     market_cap = to_df(database.fetch_stock_day_by_date(conn, date.strftime('%Y%m%d')), 'stock_code', ['market_cap'])
     if market_cap.empty:
         raise ValueError(f"시가총액 정보가 없음 - {date}")
     stock_data = to_df(database.fetch_stock_year(conn, date.year-1), 'stock_code', ['capital', 'net_profit'])
     net_profit_pprev = to_df(database.fetch_stock_year(conn, date.year-3), 'stock_code', ['net_profit'])
-    df = data.join(market_cap).join(stock_data).join(net_profit_pprev, rsuffix='_pprev')
-    
-    g = np.sqrt(df['net_profit'] / df['net_profit_pprev']) - 1
-    ni = df['net_profit'] * g
-    df['V'] = (df['capital'] + (ni - r * df['capital']) / (r - g))
-    
+    return data.join(market_cap).join(stock_data).join(net_profit_pprev, rsuffix='_pprev')
+
+def dcf_alternative(conn: Connection, companies: list[Company], date: datetime, r: float = 0.03):
+    df = get_residual_income_inputs(conn, companies, date)
+    df['V'] = get_residual_income_value(
+        df['capital'].to_numpy(dtype=float), df['net_profit'].to_numpy(dtype=float), df['net_profit_pprev'].to_numpy(dtype=float), r)
+
     return df
 
 '''
@@ -112,4 +246,4 @@ g = sqrt(net_profit / net_profit_pprev) - 1
 NI(예상 올해 당기순이익) = net_profit * g
 V = B0 + (NI - r * B0) / (r - g)
 return V / marketcap (시가총액)
-'''
\ No newline at end of file
+'''
@@ -2,54 +2,85 @@ import json
 import os
 from datetime import datetime
 from sqlite3 import Connection
-from typing import Literal
+from typing import Callable, Literal
 
 from api.dart_api import DartAPI
-from api.kiwoom_api import KiwoomAPI
+from api.kiwoom_api import KiwoomAPI, parse_watchlist_stock_day
 from api.pykrx import get_stock_day_pykrx, get_init_stock_day_pykrx, get_kospi
 from core import database
 from core.assets import get_assets
 from core.database import insert_kospi, insert_stock_day
 from core.schemas import Company, Kospi, StockDay, StockYear
-from tools.utils import to_int, to_float
+from tools.risk import get_holdings, update_risk_metrics
+from tools.utils import to_int, to_float, years_before
 
 from core.logger import get_logger
 logger = get_logger(__name__)
 
-def init_stock(conn: Connection, source: Literal['pykrx', 'kiwoom'], dart_api=None, kiwoom_api=None):
+# ka10095 한번에 조회할 종목 수
+WATCHLIST_BATCH_SIZE = 100
+
+def init_stock(conn: Connection, source: Literal['pykrx', 'kiwoom'], dart_api=None, kiwoom_api=None,
+               progress: Callable[[float, str], None] = None):
+    '''
+    progress(비율, 메시지): 진행 상황 콜백 (작업 상태 표시용)
+    '''
+    report = progress or (lambda *_: None)
     if source == 'kiwoom' and kiwoom_api is None:
         raise ValueError("kiwoom_api must be provided when source is 'kiwoom'")
     assets = get_assets()
     today = datetime.today()
-    start_date = today.replace(year=today.year - 3)
+    start_date = years_before(today, 3)
     start = start_date.strftime('%Y%m%d')
     end = today.strftime('%Y%m%d')
 
     update_companies(conn, assets)
     companies = database.fetch_companies(conn, assets)
-    update_dart(dart_api, conn, today.year-1, companies, update_prev=True)
+    report(0.05, '기업 정보 저장')
+    update_dart(dart_api, conn, today.year-1, companies, update_prev=True,
+                progress=lambda i, n: report(0.05 + 0.45 * i / n, f'DART {i}/{n}'))
     if source == 'pykrx':
-        init_pykrx(conn, start, end, companies)
+        init_pykrx(conn, start, end, companies, progress=lambda i, n: report(0.5 + 0.45 * i / n, f'주식 정보 {i}/{n}'))
     elif source == 'kiwoom':
-        pass  # init_kiwoom(kiwoom_api, conn, start, end, companies)
+        init_kiwoom(kiwoom_api, conn, end, companies)
     else:
         raise ValueError(f"Unknown source: {source}")
-    
+    report(0.95, 'KOSPI')
+
     kospi_data = get_kospi(start, end)
     insert_kospi(conn, kospi_data)
     logger.info(f'KOSPI 정보 저장: {start}~{end}, {len(kospi_data)}건')
 
-def update_day(conn: Connection):
+def update_day(conn: Connection, source: Literal['pykrx', 'kiwoom'] = 'pykrx', kiwoom_api=None,
+               progress: Callable[[float, str], None] = None):
+    report = progress or (lambda *_: None)
+    if source == 'kiwoom' and kiwoom_api is None:
+        raise ValueError("kiwoom_api must be provided when source is 'kiwoom'")
     date = datetime.today().strftime('%Y%m%d')
     logger.info(f'주식 정보 갱신 시작: {date}')
-    update_pykrx(conn, date, database.fetch_all_companies(conn))
+    companies = database.fetch_all_companies(conn)
+    if source == 'pykrx':
+        update_pykrx(conn, date, companies)
+    elif source == 'kiwoom':
+        update_kiwoom(kiwoom_api, conn, date, companies)
+    else:
+        raise ValueError(f"Unknown source: {source}")
+
+    if kiwoom_api is not None:
+        report(0.9, '위험지표')
+        try:
+            update_risk_metrics(conn, date, get_holdings(kiwoom_api))
+        except Exception as e:
+            logger.error(f'위험지표 갱신 오류: {date}: {e}')
     return date
 
-def init_pykrx(conn: Connection, start: str, end: str, companies: list[Company]):
-    for company in companies:
+def init_pykrx(conn: Connection, start: str, end: str, companies: list[Company], progress: Callable[[int, int], None] = None):
+    for i, company in enumerate(companies):
         stock_data = get_init_stock_day_pykrx(start, end, company.stock_code)
         insert_stock_day(conn, stock_data)
         logger.info(f'초기 주식 정보 저장: {company.name}, {start}~{end}, {len(stock_data)}건')
+        if progress:
+            progress(i + 1, len(companies))
 
 def update_pykrx(conn: Connection, date: str, companies: list[Company]):
     stock_data = get_stock_day_pykrx(date, companies)
@@ -61,6 +92,32 @@ def update_pykrx(conn: Connection, date: str, companies: list[Company]):
     else:
         logger.info(f'갱신할 주식 정보 없음: {date}')
 
+def init_kiwoom(kiwoom_api: KiwoomAPI, conn: Connection, date: str, companies: list[Company]):
+    '''
+    ka10095는 당일 시세만 제공하므로 과거 데이터 없이 당일 정보만 저장
+    '''
+    update_kiwoom(kiwoom_api, conn, date, companies)
+
+def update_kiwoom(kiwoom_api: KiwoomAPI, conn: Connection, date: str, companies: list[Company]):
+    stock_codes = [company.stock_code for company in companies]
+    stock_data = []
+    for i in range(0, len(stock_codes), WATCHLIST_BATCH_SIZE):
+        batch = stock_codes[i:i + WATCHLIST_BATCH_SIZE]
+        try:
+            data = kiwoom_api.get_watchlist_info(batch)
+        except Exception as e:
+            logger.error(f"키움 관심종목 조회 오류: {batch[0]}~{batch[-1]}: {e}")
+            continue
+        stock_data.extend(parse_watchlist_stock_day(data, date))
+
+    if stock_data:
+        insert_stock_day(conn, stock_data)
+        kospi_data = get_kospi(date, date)
+        insert_kospi(conn, kospi_data)
+        logger.info(f'주식 정보 갱신(키움): {date}, {len(stock_data)}건')
+    else:
+        logger.info(f'갱신할 주식 정보 없음: {date}')
+
 def update_companies(conn: Connection, assets: list[str]):
     with open('data/corpcode.json', 'r', encoding='utf-8') as f:
         company_data = json.load(f)
@@ -77,8 +134,11 @@ def update_companies(conn: Connection, assets: list[str]):
     database.insert_companies(conn, companies)
     logger.info(f"Inserted {len(companies)} companies into the database.")
         
-def update_dart(dart_api: DartAPI, conn: Connection, year: int, companies: list[Company], update_prev = False):
-    for company in companies:
+def update_dart(dart_api: DartAPI, conn: Connection, year: int, companies: list[Company], update_prev = False,
+                progress: Callable[[int, int], None] = None):
+    for i, company in enumerate(companies):
+        if progress:
+            progress(i, len(companies))
         div_info = dart_api.get_div_info(company.corp_code, year)['list']
         fin_info = dart_api.get_fin_info(company.corp_code, year)['list']
 
@@ -14,6 +14,12 @@ def get_quater(year: int):
     else:
         return datetime(year, 1, 1)
 
+def years_before(date: datetime, years: int) -> datetime:
+    '''
+    replace(year=...)는 2월 29일에서 ValueError, DateOffset은 2월 28일로 맞춤
+    '''
+    return (pd.Timestamp(date) - pd.DateOffset(years=years)).to_pydatetime()
+
 def to_int(n: str):
     num = n.replace(',', '')
     try: